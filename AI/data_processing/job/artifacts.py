@@ -0,0 +1,227 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+
+ARTIFACT_DIR = "./data/artifacts"
+
+# Các cột luôn chứa danh sách chuỗi, được ghi thành kiểu list<string> trong Parquet
+LIST_COLUMNS = ["skills"]
+
+
+def save_table(data: pd.DataFrame, path: str):
+    """
+    Ghi dữ liệu dạng bảng ra Parquet, giữ các cột danh sách ở kiểu list.
+
+    Parameters:
+        data (pd.DataFrame): Dữ liệu cần ghi.
+        path (str): Đường dẫn file Parquet.
+    """
+    data = data.copy()
+    for column in LIST_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].apply(
+                lambda x: (
+                    [str(v) for v in x]
+                    if isinstance(x, (list, tuple, np.ndarray))
+                    else []
+                )
+            )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data.to_parquet(path, index=False)
+
+
+def load_table(path: str) -> pd.DataFrame:
+    """
+    Đọc bảng Parquet do `save_table` ghi, trả các cột danh sách về list Python.
+
+    Parameters:
+        path (str): Đường dẫn file Parquet, hoặc thư mục gồm các partition
+            part-*.parquet (cột toàn giá trị rỗng ở một partition được nâng
+            kiểu theo các partition khác).
+
+    Returns:
+        pd.DataFrame: Dữ liệu đã đọc.
+    """
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        if not paths:
+            return pd.DataFrame()
+        data = pa.concat_tables(
+            [pq.read_table(part) for part in paths], promote_options="permissive"
+        ).to_pandas()
+    else:
+        data = pd.read_parquet(path)
+    for column in LIST_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].apply(
+                lambda x: list(x) if x is not None else []
+            )
+    return data
+
+
+def save_stage(
+    stage: str,
+    data: pd.DataFrame,
+    blocks: Optional[Dict[str, np.ndarray]] = None,
+    root: str = ARTIFACT_DIR,
+) -> str:
+    """
+    Lưu kết quả của một bước: bảng ra Parquet, mỗi khối vector ra một file .npy
+    (khối thưa như TF-IDF ra file .npz).
+
+    Parameters:
+        stage (str): Tên bước (ví dụ "preprocessed", "labeled").
+        data (pd.DataFrame): Dữ liệu dạng bảng.
+        blocks (Dict[str, np.ndarray], optional): Các ma trận căn theo hàng của `data`.
+        root (str): Thư mục gốc của kho artifact.
+
+    Returns:
+        str: Thư mục của bước vừa lưu.
+    """
+    for name, matrix in (blocks or {}).items():
+        if matrix.shape[0] != data.shape[0]:
+            raise ValueError(
+                f"Block '{name}' has {matrix.shape[0]} rows, expected {data.shape[0]}."
+            )
+    with writing_stage(stage, root) as tmp_dir:
+        save_table(data, os.path.join(tmp_dir, "table.parquet"))
+        manifest = {"rows": int(data.shape[0]), "blocks": {}}
+        for name, matrix in (blocks or {}).items():
+            if sparse.issparse(matrix):
+                sparse.save_npz(os.path.join(tmp_dir, f"{name}.npz"), matrix.tocsr())
+            else:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(matrix))
+            manifest["blocks"][name] = {
+                "shape": list(matrix.shape),
+                "dtype": str(matrix.dtype),
+                "sparse": bool(sparse.issparse(matrix)),
+            }
+        write_manifest(tmp_dir, manifest)
+    stage_dir = os.path.join(root, stage)
+    print(f"Saved stage '{stage}' to {stage_dir}")
+    return stage_dir
+
+
+@contextmanager
+def writing_stage(stage: str, root: str = ARTIFACT_DIR) -> Iterator[str]:
+    """
+    Ghi một bước vào thư mục tạm cạnh bước cũ và chỉ thay bước cũ khi đã ghi
+    xong, nên lỗi giữa chừng không làm mất artifact của lần chạy trước.
+
+    Parameters:
+        stage (str): Tên bước.
+        root (str): Thư mục gốc của kho artifact.
+
+    Yields:
+        str: Thư mục tạm để ghi bước mới.
+    """
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{stage}.tmp-", dir=root)
+    try:
+        yield tmp_dir
+        replace_stage(tmp_dir, stage, root)
+    finally:
+        # Sau khi thay thành công thư mục tạm không còn; lỗi thì dọn phần đã ghi
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def replace_stage(tmp_dir: str, stage: str, root: str = ARTIFACT_DIR):
+    stage_dir = os.path.join(root, stage)
+    # Dọn bản cũ của các lần trước chưa xóa được (vd. file còn được ánh xạ)
+    for leftover in glob.glob(os.path.join(root, f".{stage}.old-*")):
+        shutil.rmtree(leftover, ignore_errors=True)
+    if not os.path.exists(stage_dir):
+        os.replace(tmp_dir, stage_dir)
+        return
+    old_dir = tempfile.mkdtemp(prefix=f".{stage}.old-", dir=root)
+    try:
+        os.replace(stage_dir, os.path.join(old_dir, stage))
+    except OSError as e:
+        raise RuntimeError(
+            f"Cannot replace stage '{stage}': files in {stage_dir} are in use "
+            "(load it with mmap=False to keep it replaceable)."
+        ) from e
+    os.replace(tmp_dir, stage_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def write_manifest(stage_dir: str, manifest: Dict):
+    # Manifest ghi sau cùng: bước chỉ được coi là hoàn tất khi có file này
+    with open(os.path.join(stage_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def save_partitioned_stage(
+    stage: str, chunks: Iterable[pd.DataFrame], root: str = ARTIFACT_DIR
+) -> str:
+    """
+    Lưu bảng của một bước theo từng partition Parquet khi các khối được tạo ra,
+    không ghép toàn bộ dữ liệu trong bộ nhớ (bước này không có khối vector).
+
+    Parameters:
+        stage (str): Tên bước.
+        chunks (Iterable[pd.DataFrame]): Các khối dữ liệu, ví dụ từ một generator.
+        root (str): Thư mục gốc của kho artifact.
+
+    Returns:
+        str: Thư mục của bước vừa lưu.
+    """
+    rows, partitions = 0, 0
+    with writing_stage(stage, root) as tmp_dir:
+        for chunk in chunks:
+            path = os.path.join(tmp_dir, "table", f"part-{partitions:05d}.parquet")
+            save_table(chunk, path)
+            rows += chunk.shape[0]
+            partitions += 1
+            print(f"Wrote {chunk.shape[0]} records to partition {partitions - 1}")
+        write_manifest(tmp_dir, {"rows": rows, "blocks": {}, "partitions": partitions})
+    stage_dir = os.path.join(root, stage)
+    print(f"Saved stage '{stage}' to {stage_dir} in {partitions} partitions")
+    return stage_dir
+
+
+def has_stage(stage: str, root: str = ARTIFACT_DIR) -> bool:
+    return os.path.exists(os.path.join(root, stage, "manifest.json"))
+
+
+def load_stage(
+    stage: str, root: str = ARTIFACT_DIR, mmap: bool = True
+) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
+    """
+    Nạp lại kết quả của một bước đã lưu bằng `save_stage`.
+
+    Parameters:
+        stage (str): Tên bước.
+        root (str): Thư mục gốc của kho artifact.
+        mmap (bool): Ánh xạ bộ nhớ các file .npy thay vì đọc toàn bộ vào RAM
+            (khối thưa luôn được đọc vào RAM). Trên Windows, bước đang được ánh
+            xạ không thể bị ghi đè cho tới khi các mảng được giải phóng.
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, np.ndarray]]: (bảng dữ liệu, các khối vector).
+    """
+    stage_dir = os.path.join(root, stage)
+    with open(os.path.join(stage_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    table = "table" if "partitions" in manifest else "table.parquet"
+    data = load_table(os.path.join(stage_dir, table))
+    blocks = {}
+    for name, info in manifest["blocks"].items():
+        if info.get("sparse"):
+            blocks[name] = sparse.load_npz(os.path.join(stage_dir, f"{name}.npz"))
+        else:
+            blocks[name] = np.load(
+                os.path.join(stage_dir, f"{name}.npy"), mmap_mode="r" if mmap else None
+            )
+    print(f"Loaded stage '{stage}' with {manifest['rows']} records.")
+    return data, blocks
@@ -0,0 +1,196 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class JobCategorizer:
+    """
+    Gán nhóm công việc cho tin tuyển dụng mới mà không cần fit lại pipeline.
+
+    Chỉ giữ các mảng cần cho phép chiếu và gán cụm (PCA, StandardScaler, tâm cụm
+    KMeans và nhãn của từng cụm), lưu thành một file .npz nên có thể nạp trong
+    dịch vụ mà không cần scikit-learn. Tâm cụm được cập nhật trực tuyến theo
+    quy tắc của mini-batch KMeans khi có dữ liệu mới.
+
+    `embedding_config` ghi lại cách tạo embedding lúc fit (model, max_length,
+    pooling, normalize). Embedding tạo theo cấu hình khác vẫn cùng số chiều nhưng
+    bị gán sai cụm mà không báo lỗi, nên dùng `categorize_text` (tự embedding
+    theo cấu hình đã lưu) hoặc kiểm tra trước bằng `check_embedding_config`.
+    """
+
+    def __init__(
+        self,
+        pca_mean: np.ndarray,
+        pca_components: np.ndarray,
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        centers: np.ndarray,
+        labels: List[str],
+        counts: Optional[np.ndarray] = None,
+        embedding_config: Optional[Dict] = None,
+    ):
+        self.pca_mean = np.asarray(pca_mean, dtype=np.float32)
+        self.pca_components = np.asarray(pca_components, dtype=np.float32)
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float32)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float32)
+        self.centers = np.asarray(centers, dtype=np.float32)
+        self.labels = list(labels)
+        self.counts = (
+            np.asarray(counts, dtype=np.int64)
+            if counts is not None
+            else np.zeros(len(self.centers), dtype=np.int64)
+        )
+        self.embedding_config = dict(embedding_config or {})
+
+    @classmethod
+    def from_models(
+        cls,
+        pca,
+        scaler,
+        kmeans,
+        labels: Dict[int, str],
+        counts: Optional[np.ndarray] = None,
+        embedding_config: Optional[Dict] = None,
+    ) -> "JobCategorizer":
+        """
+        Tạo JobCategorizer từ các model scikit-learn đã fit.
+
+        Parameters:
+            pca: PCA/IncrementalPCA đã fit trên embedding.
+            scaler: StandardScaler đã fit trên đầu ra PCA.
+            kmeans: KMeans/MiniBatchKMeans đã fit trên dữ liệu chuẩn hóa.
+            labels (Dict[int, str]): Nhãn mô tả của từng cluster.
+            counts (np.ndarray, optional): Số tin của từng cluster.
+            embedding_config (Dict, optional): Cấu hình embedding lúc fit
+                (model, max_length, pooling, normalize).
+
+        Returns:
+            JobCategorizer: Bộ gán nhóm công việc.
+        """
+        centers = kmeans.cluster_centers_
+        return cls(
+            pca.mean_,
+            pca.components_,
+            scaler.mean_,
+            scaler.scale_,
+            centers,
+            [labels.get(cluster, "") for cluster in range(len(centers))],
+            counts,
+            embedding_config,
+        )
+
+    def check_embedding_config(self, **config):
+        """Báo lỗi nếu cấu hình embedding khác với cấu hình lúc fit."""
+        mismatched = {
+            key: (value, self.embedding_config[key])
+            for key, value in config.items()
+            if key in self.embedding_config and self.embedding_config[key] != value
+        }
+        if mismatched:
+            raise ValueError(
+                f"Embedding config does not match the categorizer (given, expected): "
+                f"{mismatched}"
+            )
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        projected = (embeddings - self.pca_mean) @ self.pca_components.T
+        return (projected - self.scaler_mean) / self.scaler_scale
+
+    def assign(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Gán cluster gần nhất cho từng embedding.
+
+        Parameters:
+            embeddings (np.ndarray): Embedding PhoBERT, một hàng mỗi tin.
+
+        Returns:
+            np.ndarray: Chỉ số cluster của từng hàng.
+        """
+        points = self.transform(embeddings)
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, bỏ ||x||^2 vì không đổi theo c
+        distances = (self.centers**2).sum(axis=1) - 2 * points @ self.centers.T
+        return distances.argmin(axis=1)
+
+    def categorize(self, embeddings: np.ndarray) -> List[str]:
+        return [self.labels[cluster] for cluster in self.assign(embeddings)]
+
+    def categorize_text(self, texts: List[str]) -> List[str]:
+        """
+        Embedding văn bản theo đúng cấu hình đã lưu rồi gán nhóm công việc.
+
+        Parameters:
+            texts (List[str]): Mô tả công việc đã làm sạch như cột "jd" của pipeline.
+
+        Returns:
+            List[str]: Nhãn nhóm công việc của từng văn bản.
+        """
+        if not self.embedding_config:
+            raise ValueError("Categorizer was saved without an embedding config.")
+        # Import muộn để dùng categorize() không cần torch/transformers
+        from vectorization import MODEL_NAME, embed_text_batch
+
+        self.check_embedding_config(model=MODEL_NAME)
+        embeddings = embed_text_batch(
+            list(texts),
+            max_length=self.embedding_config["max_length"],
+            pooling=self.embedding_config["pooling"],
+            normalize=self.embedding_config["normalize"],
+        )
+        return self.categorize(embeddings)
+
+    def update(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Cập nhật tâm cụm với các tin mới theo quy tắc mini-batch KMeans
+        (mỗi tâm dịch về trung bình các điểm mới với tốc độ 1/số điểm đã thấy).
+
+        Parameters:
+            embeddings (np.ndarray): Embedding PhoBERT của các tin mới.
+
+        Returns:
+            np.ndarray: Chỉ số cluster được gán cho từng tin mới.
+        """
+        points = self.transform(embeddings)
+        assigned = self.assign(embeddings)
+        for cluster in np.unique(assigned):
+            members = points[assigned == cluster]
+            self.counts[cluster] += len(members)
+            rate = len(members) / self.counts[cluster]
+            self.centers[cluster] += rate * (
+                members.mean(axis=0) - self.centers[cluster]
+            )
+        return assigned
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            pca_mean=self.pca_mean,
+            pca_components=self.pca_components,
+            scaler_mean=self.scaler_mean,
+            scaler_scale=self.scaler_scale,
+            centers=self.centers,
+            labels=np.asarray(self.labels, dtype=str),
+            counts=self.counts,
+            embedding_config=np.asarray(json.dumps(self.embedding_config)),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "JobCategorizer":
+        with np.load(path) as arrays:
+            return cls(
+                arrays["pca_mean"],
+                arrays["pca_components"],
+                arrays["scaler_mean"],
+                arrays["scaler_scale"],
+                arrays["centers"],
+                arrays["labels"].tolist(),
+                arrays["counts"],
+                (
+                    json.loads(str(arrays["embedding_config"]))
+                    if "embedding_config" in arrays
+                    else None
+                ),
+            )
@@ -1,55 +1,291 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN
+from scipy import sparse
+from sklearn.cluster import (
+    DBSCAN,
+    HDBSCAN,
+    OPTICS,
+    KMeans,
+    MiniBatchKMeans,
+    cluster_optics_dbscan,
+)
+from sklearn.neighbors import NearestNeighbors
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score
+from sklearn.metrics import (
+    calinski_harabasz_score,
+    davies_bouldin_score,
+    silhouette_score,
+)
 from sklearn.feature_extraction.text import CountVectorizer
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Tuple
 import matplotlib.pyplot as plt
 import seaborn as sns
+from threadpoolctl import threadpool_limits
+
+from projection import fit_projection, transform_in_chunks
 
 
-def standardize_data(data: pd.DataFrame, columns: List[str]) -> np.ndarray:
+def standardize_data(
+    features: np.ndarray, scaler: Optional[StandardScaler] = None
+) -> np.ndarray:
     """
-    Chuẩn hóa dữ liệu embedding dựa trên các cột PCA.
+    Chuẩn hóa ma trận embedding PCA.
 
     Parameters:
-        data (pd.DataFrame): Dữ liệu đầu vào.
-        columns (List[str]): Các cột chứa embedding PCA.
+        features (np.ndarray): Ma trận embedding PCA (khối "embedding_pca").
+        scaler (StandardScaler, optional): Scaler để fit; truyền vào khi cần giữ
+            lại scaler đã fit (ví dụ để lưu cùng JobCategorizer).
 
     Returns:
         np.ndarray: Dữ liệu chuẩn hóa.
     """
-    scaler = StandardScaler()
-    return scaler.fit_transform(data[columns])
+    scaler = scaler if scaler is not None else StandardScaler()
+    return scaler.fit_transform(features)
+
+
+KMEANS_CRITERIA = ("silhouette", "calinski_harabasz", "davies_bouldin", "elbow")
+
+
+def stratified_sample(
+    data: np.ndarray, sample_size: int, n_strata: int = 10, random_state: int = 42
+) -> np.ndarray:
+    """
+    Lấy mẫu phân tầng theo phân vị của thành phần chính đầu tiên, để mẫu giữ
+    được hình dạng phân bố của toàn bộ dữ liệu.
+
+    Parameters:
+        data (np.ndarray): Dữ liệu đã chuẩn hóa (cột đầu là thành phần PCA lớn nhất).
+        sample_size (int): Số điểm cần lấy.
+        n_strata (int): Số tầng.
+        random_state (int): Seed ngẫu nhiên.
+
+    Returns:
+        np.ndarray: Chỉ số các điểm được chọn.
+    """
+    n = data.shape[0]
+    if sample_size >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(random_state)
+    edges = np.quantile(data[:, 0], np.linspace(0, 1, n_strata + 1)[1:-1])
+    strata = np.searchsorted(edges, data[:, 0])
+    picked = []
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        take = max(1, int(round(sample_size * members.size / n)))
+        picked.append(rng.choice(members, size=min(take, members.size), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def _evaluate_k(args) -> dict:
+    # Hàm cấp module để chạy được trong ProcessPoolExecutor
+    sample, k, criteria, random_state = args
+    with threadpool_limits(limits=1):
+        kmeans = KMeans(n_clusters=k, random_state=random_state)
+        labels = kmeans.fit_predict(sample)
+        scores = {"elbow": float(kmeans.inertia_)}
+        if "silhouette" in criteria:
+            scores["silhouette"] = float(silhouette_score(sample, labels))
+        if "calinski_harabasz" in criteria:
+            scores["calinski_harabasz"] = float(calinski_harabasz_score(sample, labels))
+        if "davies_bouldin" in criteria:
+            scores["davies_bouldin"] = float(davies_bouldin_score(sample, labels))
+    return {"k": k, "scores": scores, "centers": kmeans.cluster_centers_}
+
+
+def _elbow_k(ks: List[int], inertias: List[float]) -> int:
+    # Điểm khuỷu: điểm xa nhất tới đường thẳng nối hai đầu đường cong inertia
+    x = (np.asarray(ks) - ks[0]) / max(ks[-1] - ks[0], 1)
+    y = np.asarray(inertias)
+    y = (y - y.min()) / max(y.max() - y.min(), 1e-12)
+    distances = np.abs((y[-1] - y[0]) * x - (x[-1] - x[0]) * y + y[0]) / np.hypot(
+        y[-1] - y[0], x[-1] - x[0]
+    )
+    return ks[int(np.argmax(distances))]
+
+
+def select_kmeans_clusters(
+    data: np.ndarray,
+    k_range: range = range(2, 11),
+    criterion: str = "silhouette",
+    sample_size: Optional[int] = 10000,
+    n_jobs: Optional[int] = None,
+    random_state: int = 42,
+) -> dict:
+    """
+    Chọn số cluster cho KMeans: mỗi k được fit song song trên một mẫu phân tầng
+    và chấm điểm theo các tiêu chí silhouette, Calinski–Harabasz, Davies–Bouldin
+    và inertia (elbow).
+
+    Parameters:
+        data (np.ndarray): Dữ liệu đầu vào đã chuẩn hóa.
+        k_range (range): Dải giá trị của k để thử nghiệm.
+        criterion (str): Tiêu chí chọn k, một trong KMEANS_CRITERIA.
+        sample_size (int, optional): Số điểm của mẫu; None để dùng toàn bộ dữ liệu.
+        n_jobs (int, optional): Số tiến trình; mặc định bằng số CPU, 1 để chạy tuần tự.
+        random_state (int): Seed ngẫu nhiên.
+
+    Returns:
+        dict: best_k, centers (tâm cụm của k tốt nhất trên mẫu, dùng để khởi tạo
+        khi fit lại trên toàn bộ dữ liệu) và scores (điểm của từng k).
+    """
+    if criterion not in KMEANS_CRITERIA:
+        raise ValueError(
+            f"Unsupported criterion: {criterion}. Use one of {KMEANS_CRITERIA}."
+        )
+    sample = data
+    if sample_size is not None:
+        sample = data[stratified_sample(data, sample_size, random_state=random_state)]
+    # KMeans và các tiêu chí cần 2 <= k < số điểm của mẫu
+    ks = [k for k in k_range if 2 <= k < sample.shape[0]]
+    if not ks:
+        raise ValueError(
+            f"No k in {list(k_range)} fits a sample of {sample.shape[0]} points; "
+            "KMeans selection needs at least k + 1 points and k >= 2."
+        )
+    tasks = [(sample, k, (criterion,), random_state) for k in ks]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_evaluate_k, tasks))
+    else:
+        results = [_evaluate_k(task) for task in tasks]
+
+    values = [result["scores"][criterion] for result in results]
+    if criterion == "elbow":
+        best_k = _elbow_k(ks, values)
+    elif criterion == "davies_bouldin":
+        best_k = ks[int(np.argmin(values))]
+    else:
+        best_k = ks[int(np.argmax(values))]
+    best = next(result for result in results if result["k"] == best_k)
+    print(
+        f"KMeans model selection on {sample.shape[0]} samples ({criterion}): "
+        f"{dict(zip(ks, np.round(values, 4)))}"
+    )
+    return {
+        "best_k": best_k,
+        "centers": best["centers"],
+        "scores": {result["k"]: result["scores"] for result in results},
+    }
 
 
 def find_optimal_kmeans_clusters(
-    data: np.ndarray, k_range: range = range(2, 11)
+    data: np.ndarray, k_range: range = range(2, 11), **kwargs
 ) -> int:
     """
-    Tìm số lượng clusters tối ưu cho KMeans bằng silhouette score.
+    Tìm số lượng clusters tối ưu cho KMeans (mặc định theo silhouette trên mẫu).
 
     Parameters:
         data (np.ndarray): Dữ liệu đầu vào đã chuẩn hóa.
         k_range (range): Dải giá trị của k để thử nghiệm.
+        **kwargs: Tham số của `select_kmeans_clusters`.
 
     Returns:
         int: Số lượng clusters tối ưu.
     """
-    best_k, best_score = k_range.start, -1
-    for k in k_range:
-        kmeans = KMeans(n_clusters=k, random_state=42)
-        clusters = kmeans.fit_predict(data)
-        score = silhouette_score(data, clusters)
-        if score > best_score:
-            best_k, best_score = k, score
-    return best_k
+    return select_kmeans_clusters(data, k_range, **kwargs)["best_k"]
+
+
+def fit_kmeans(
+    data_scaled: np.ndarray,
+    n_clusters: int,
+    init: Optional[np.ndarray] = None,
+    minibatch: bool = False,
+    chunk_size: int = 4096,
+    n_epochs: int = 3,
+    random_state: int = 42,
+):
+    """
+    Fit KMeans trên toàn bộ dữ liệu, hoặc MiniBatchKMeans qua partial_fit theo
+    từng khối `chunk_size` hàng khi `minibatch=True`.
+
+    Parameters:
+        data_scaled (np.ndarray): Dữ liệu chuẩn hóa (có thể là np.memmap).
+        n_clusters (int): Số lượng clusters.
+        init (np.ndarray, optional): Tâm cụm khởi tạo.
+        minibatch (bool): Dùng MiniBatchKMeans thay cho KMeans.
+        chunk_size (int): Số hàng mỗi khối khi partial_fit.
+        n_epochs (int): Số lượt duyệt qua dữ liệu khi partial_fit.
+        random_state (int): Seed ngẫu nhiên.
+
+    Returns:
+        KMeans hoặc MiniBatchKMeans đã fit.
+    """
+    if not minibatch:
+        if init is not None:
+            kmeans = KMeans(
+                n_clusters=n_clusters, init=init, n_init=1, random_state=random_state
+            )
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
+        return kmeans.fit(data_scaled)
+
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        init=init if init is not None else "k-means++",
+        n_init=1 if init is not None else 3,
+        batch_size=chunk_size,
+        random_state=random_state,
+    )
+    rng = np.random.default_rng(random_state)
+    starts = np.arange(0, data_scaled.shape[0], chunk_size)
+    for _ in range(n_epochs):
+        # Khối đầu tiên phải đủ n_clusters điểm để khởi tạo tâm cụm
+        order = np.concatenate([starts[:1], rng.permutation(starts[1:])])
+        for start in order:
+            kmeans.partial_fit(np.asarray(data_scaled[start : start + chunk_size]))
+    return kmeans
+
+
+def update_kmeans(kmeans: MiniBatchKMeans, chunks: Iterable[np.ndarray]):
+    """
+    Cập nhật MiniBatchKMeans đã fit với các khối dữ liệu mới (ví dụ tin tuyển
+    dụng vừa thu thập), không cần fit lại từ đầu.
+
+    Parameters:
+        kmeans (MiniBatchKMeans): Model đã fit.
+        chunks (Iterable[np.ndarray]): Các khối dữ liệu đã chuẩn hóa.
+
+    Returns:
+        MiniBatchKMeans: Model sau khi cập nhật.
+    """
+    for chunk in chunks:
+        kmeans.partial_fit(np.asarray(chunk))
+    return kmeans
+
+
+def predict_clusters(
+    kmeans, data_scaled: np.ndarray, chunk_size: int = 65536
+) -> np.ndarray:
+    """
+    Gán cluster cho từng hàng theo từng khối để bộ nhớ không phụ thuộc số hàng.
+
+    Parameters:
+        kmeans: Model KMeans/MiniBatchKMeans đã fit.
+        data_scaled (np.ndarray): Dữ liệu chuẩn hóa.
+        chunk_size (int): Số hàng mỗi khối.
+
+    Returns:
+        np.ndarray: Nhãn cluster của từng hàng.
+    """
+    return np.concatenate(
+        [
+            kmeans.predict(np.asarray(data_scaled[start : start + chunk_size]))
+            for start in range(0, data_scaled.shape[0], chunk_size)
+        ]
+    )
 
 
 def apply_kmeans(
-    data: pd.DataFrame, data_scaled: np.ndarray, n_clusters: int
+    data: pd.DataFrame,
+    data_scaled: np.ndarray,
+    n_clusters: int,
+    init: Optional[np.ndarray] = None,
+    minibatch: bool = False,
 ) -> pd.DataFrame:
     """
     Áp dụng KMeans với số lượng cluster tối ưu và lưu vào DataFrame.
@@ -58,48 +294,189 @@ def apply_kmeans(
         data (pd.DataFrame): Dữ liệu đầu vào.
         data_scaled (np.ndarray): Dữ liệu chuẩn hóa.
         n_clusters (int): Số lượng clusters tối ưu cho KMeans.
+        init (np.ndarray, optional): Tâm cụm khởi tạo (ví dụ từ
+            `select_kmeans_clusters`); khi có thì chỉ cần một lần khởi tạo.
+        minibatch (bool): Dùng MiniBatchKMeans với partial_fit theo khối.
 
     Returns:
         pd.DataFrame: Dữ liệu với cột KMeans cluster.
     """
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    data["kmeans_cluster"] = kmeans.fit_predict(data_scaled)
+    kmeans = fit_kmeans(data_scaled, n_clusters, init=init, minibatch=minibatch)
+    data["kmeans_cluster"] = predict_clusters(kmeans, data_scaled)
     return data
 
 
+DENSITY_METHODS = ("dbscan", "optics", "hdbscan")
+
+
+def build_radius_graph(
+    data_scaled: np.ndarray,
+    radius: float,
+    chunk_size: int = 4096,
+    n_jobs: Optional[int] = None,
+) -> sparse.csr_matrix:
+    """
+    Xây đồ thị lân cận bán kính dạng thưa (khoảng cách tới mọi điểm trong
+    `radius`) bằng ball tree, truy vấn theo từng khối để bộ nhớ không vượt quá
+    một khối kết quả. Đồ thị dùng lại được cho mọi DBSCAN có eps <= radius.
+
+    Parameters:
+        data_scaled (np.ndarray): Dữ liệu chuẩn hóa.
+        radius (float): Bán kính lân cận (eps lớn nhất sẽ dùng).
+        chunk_size (int): Số điểm truy vấn mỗi khối.
+        n_jobs (int, optional): Số luồng khi truy vấn.
+
+    Returns:
+        sparse.csr_matrix: Ma trận khoảng cách thưa (n, n).
+    """
+    neighbors = NearestNeighbors(
+        radius=radius, algorithm="ball_tree", n_jobs=n_jobs
+    ).fit(data_scaled)
+    blocks = [
+        neighbors.radius_neighbors_graph(
+            np.asarray(data_scaled[start : start + chunk_size]), mode="distance"
+        )
+        for start in range(0, data_scaled.shape[0], chunk_size)
+    ]
+    graph = sparse.vstack(blocks, format="csr")
+    print(
+        f"Radius graph (r={radius}): {graph.nnz} edges, "
+        f"{graph.nnz / max(graph.shape[0], 1):.1f} neighbors/point on average."
+    )
+    return graph
+
+
+def sweep_dbscan(
+    data_scaled: np.ndarray,
+    eps_values: List[float],
+    min_samples_values: List[int],
+    graph: Optional[sparse.csr_matrix] = None,
+) -> Tuple[pd.DataFrame, Dict[Tuple[float, int], np.ndarray]]:
+    """
+    Chạy DBSCAN cho mọi cặp (eps, min_samples) trên cùng một đồ thị lân cận,
+    nên việc tìm lân cận chỉ thực hiện một lần cho cả lượt dò tham số.
+
+    Parameters:
+        data_scaled (np.ndarray): Dữ liệu chuẩn hóa.
+        eps_values (List[float]): Các giá trị eps.
+        min_samples_values (List[int]): Các giá trị min_samples.
+        graph (sparse.csr_matrix, optional): Đồ thị từ `build_radius_graph` với
+            bán kính >= max(eps_values); mặc định được xây mới.
+
+    Returns:
+        Tuple[pd.DataFrame, Dict]: Bảng tóm tắt (số cluster, tỉ lệ noise) và
+        nhãn của từng cặp tham số.
+    """
+    if graph is None:
+        graph = build_radius_graph(data_scaled, max(eps_values))
+    results, summary = {}, []
+    for eps in eps_values:
+        for min_samples in min_samples_values:
+            labels = DBSCAN(
+                eps=eps, min_samples=min_samples, metric="precomputed"
+            ).fit_predict(graph)
+            results[(eps, min_samples)] = labels
+            summary.append(
+                {
+                    "eps": eps,
+                    "min_samples": min_samples,
+                    "n_clusters": int(labels.max() + 1),
+                    "noise_ratio": float((labels == -1).mean()),
+                }
+            )
+    return pd.DataFrame(summary), results
+
+
+def optics_clusterings(
+    data_scaled: np.ndarray,
+    eps_values: List[float],
+    min_samples: int = 5,
+    max_eps: float = np.inf,
+) -> Dict[float, np.ndarray]:
+    """
+    Fit OPTICS một lần rồi trích xuất phân cụm kiểu DBSCAN ở nhiều mật độ (eps)
+    từ cùng thứ tự và khoảng cách reachability.
+
+    Parameters:
+        data_scaled (np.ndarray): Dữ liệu chuẩn hóa.
+        eps_values (List[float]): Các giá trị eps cần trích xuất (<= max_eps).
+        min_samples (int): Số điểm tối thiểu trong vùng lân cận.
+        max_eps (float): Bán kính lớn nhất khi fit OPTICS; càng nhỏ càng nhanh.
+
+    Returns:
+        Dict[float, np.ndarray]: Nhãn cluster theo từng eps.
+    """
+    optics = OPTICS(min_samples=min_samples, max_eps=max_eps).fit(data_scaled)
+    return {
+        eps: cluster_optics_dbscan(
+            reachability=optics.reachability_,
+            core_distances=optics.core_distances_,
+            ordering=optics.ordering_,
+            eps=eps,
+        )
+        for eps in eps_values
+    }
+
+
 def apply_dbscan(
-    data: pd.DataFrame, data_scaled: np.ndarray, eps: float = 0.5, min_samples: int = 5
+    data: pd.DataFrame,
+    data_scaled: np.ndarray,
+    eps: float = 0.5,
+    min_samples: int = 5,
+    graph: Optional[sparse.csr_matrix] = None,
+    method: str = "dbscan",
 ) -> pd.DataFrame:
     """
-    Áp dụng DBSCAN để phân cụm và lưu vào DataFrame.
+    Áp dụng DBSCAN (hoặc OPTICS/HDBSCAN) để phân cụm và lưu vào DataFrame.
 
     Parameters:
         data (pd.DataFrame): Dữ liệu đầu vào.
         data_scaled (np.ndarray): Dữ liệu chuẩn hóa.
         eps (float): Bán kính tìm kiếm lân cận trong DBSCAN.
         min_samples (int): Số điểm tối thiểu trong vùng lân cận để tạo cluster.
+        graph (sparse.csr_matrix, optional): Đồ thị lân cận dựng sẵn từ
+            `build_radius_graph` (bán kính >= eps), chỉ dùng với method="dbscan".
+        method (str): "dbscan", "optics" (trích xuất kiểu DBSCAN tại eps) hoặc
+            "hdbscan" (min_cluster_size = min_samples, không cần eps).
 
     Returns:
         pd.DataFrame: Dữ liệu với cột DBSCAN cluster.
     """
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-    data["dbscan_cluster"] = dbscan.fit_predict(data_scaled)
+    if method not in DENSITY_METHODS:
+        raise ValueError(f"Unsupported method: {method}. Use one of {DENSITY_METHODS}.")
+    if method == "optics":
+        labels = optics_clusterings(data_scaled, [eps], min_samples=min_samples)[eps]
+    elif method == "hdbscan":
+        labels = HDBSCAN(min_cluster_size=min_samples, copy=True).fit_predict(
+            data_scaled
+        )
+    elif graph is not None:
+        labels = DBSCAN(
+            eps=eps, min_samples=min_samples, metric="precomputed"
+        ).fit_predict(graph)
+    else:
+        labels = DBSCAN(eps=eps, min_samples=min_samples).fit_predict(data_scaled)
+    data["dbscan_cluster"] = labels
     return data
 
 
-def reduce_dimensions(data_scaled: np.ndarray, n_components: int = 2) -> np.ndarray:
+def reduce_dimensions(
+    data_scaled: np.ndarray, n_components: int = 2, method: str = "auto"
+) -> np.ndarray:
     """
     Giảm chiều dữ liệu bằng PCA để trực quan hóa.
 
     Parameters:
         data_scaled (np.ndarray): Dữ liệu đã chuẩn hóa.
         n_components (int): Số thành phần PCA cho mục đích trực quan hóa.
+        method (str): "auto", "full", "randomized" hoặc "incremental"
+            (xem `projection.fit_projection`).
 
     Returns:
         np.ndarray: Dữ liệu sau khi giảm chiều bằng PCA.
     """
-    pca = PCA(n_components=n_components)
-    return pca.fit_transform(data_scaled)
+    pca = fit_projection(data_scaled, n_components, method=method)
+    return transform_in_chunks(pca, data_scaled)
 
 
 def visualize_clusters(data: pd.DataFrame, cluster_column: str, title: str):
@@ -126,32 +503,67 @@ def visualize_clusters(data: pd.DataFrame, cluster_column: str, title: str):
     plt.show()
 
 
+LABEL_WEIGHTINGS = ("count", "ctfidf")
+
+
 def assign_cluster_labels_ngrams(
-    data: pd.DataFrame, cluster_column: str, n_top_ngrams: int = 2
+    data: pd.DataFrame,
+    cluster_column: str,
+    n_top_ngrams: int = 2,
+    weighting: str = "count",
 ) -> Dict[int, str]:
     """
     Gán nhãn cho các cluster dựa trên bigram và trigram phổ biến nhất từ tiêu đề công việc.
 
+    Từ vựng n-gram được fit một lần trên toàn bộ tiêu đề; số lần xuất hiện của
+    mỗi n-gram trong từng cluster được tính bằng một phép nhân ma trận chỉ thị
+    (cluster x tin) với ma trận đếm thưa (tin x n-gram).
+
     Parameters:
         data (pd.DataFrame): Dữ liệu chứa tiêu đề công việc và kết quả phân cụm.
         cluster_column (str): Tên cột chứa kết quả phân cụm.
         n_top_ngrams (int): Số lượng n-gram phổ biến nhất.
+        weighting (str): "count" (tần suất trong cluster) hoặc "ctfidf"
+            (class-based TF-IDF, ưu tiên n-gram đặc trưng riêng của cluster).
 
     Returns:
         Dict[int, str]: Bản đồ giữa số cluster và nhãn mô tả.
     """
+    if weighting not in LABEL_WEIGHTINGS:
+        raise ValueError(
+            f"Unsupported weighting: {weighting}. Use one of {LABEL_WEIGHTINGS}."
+        )
+    data = data[data[cluster_column] != -1]  # Bỏ qua noise trong DBSCAN
+    if data.empty:
+        return {}
+    clusters, codes = np.unique(data[cluster_column].to_numpy(), return_inverse=True)
+
+    vectorizer = CountVectorizer(ngram_range=(2, 3), stop_words="english")
+    try:
+        ngram_matrix = vectorizer.fit_transform(data["title"].fillna(""))
+    except ValueError:  # Không có n-gram nào sau khi bỏ stop words
+        return {cluster: "" for cluster in clusters}
+    vocabulary = vectorizer.get_feature_names_out()
+
+    indicator = sparse.csr_matrix(
+        (np.ones(len(codes)), (codes, np.arange(len(codes)))),
+        shape=(len(clusters), len(codes)),
+    )
+    scores = (indicator @ ngram_matrix).tocsr().astype(np.float64)
+
+    if weighting == "ctfidf":
+        # c-TF-IDF: tf chuẩn hóa theo cluster x log(1 + số từ TB mỗi cluster / tần suất toàn cục)
+        cluster_sizes = np.asarray(scores.sum(axis=1)).ravel()
+        term_totals = np.asarray(scores.sum(axis=0)).ravel()
+        idf = np.log1p(cluster_sizes.mean() / np.maximum(term_totals, 1))
+        scores = sparse.diags(1 / np.maximum(cluster_sizes, 1)) @ scores
+        scores = (scores @ sparse.diags(idf)).tocsr()
+
     cluster_labels = {}
-    for cluster in data[cluster_column].unique():
-        if cluster == -1:  # Bỏ qua noise trong DBSCAN
-            continue
-        cluster_titles = data[data[cluster_column] == cluster]["title"]
-        vectorizer = CountVectorizer(ngram_range=(2, 3), stop_words="english")
-        ngram_matrix = vectorizer.fit_transform(cluster_titles)
-        sum_ngrams = ngram_matrix.sum(axis=0)
-        ngrams_freq = [
-            (ngram, sum_ngrams[0, idx]) for ngram, idx in vectorizer.vocabulary_.items()
-        ]
-        sorted_ngrams = sorted(ngrams_freq, key=lambda x: x[1], reverse=True)
-        common_ngrams = [ngram for ngram, freq in sorted_ngrams[:n_top_ngrams]]
-        cluster_labels[cluster] = " / ".join(common_ngrams).title()
+    for row, cluster in enumerate(clusters):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        values, columns = scores.data[start:end], scores.indices[start:end]
+        # Điểm giảm dần, hòa điểm thì theo thứ tự từ vựng (cả tại ngưỡng top-k)
+        order = np.lexsort((columns, -values))[:n_top_ngrams]
+        cluster_labels[cluster] = " / ".join(vocabulary[columns[order]]).title()
     return cluster_labels
@@ -382,6 +382,34 @@ skill_dict = [
     "quản lý kho",
 ]
 
+# Từ đồng nghĩa / viết tắt được quy về kỹ năng chuẩn trong skill_dict
+skill_aliases = {
+    "học máy": ["machine learning", "ml"],
+    "học sâu": ["deep learning"],
+    "javascript": ["js"],
+    "typescript": ["ts"],
+    "kubernetes": ["k8s"],
+    "postgresql": ["postgres"],
+    "mongodb": ["mongo"],
+    "node.js": ["nodejs", "node js"],
+    "react": ["reactjs", "react.js"],
+    "vue": ["vuejs", "vue.js"],
+    "angular": ["angularjs"],
+    "c#": ["csharp"],
+    ".NET": ["dotnet"],
+    "ci/cd": ["ci cd"],
+    "google cloud": ["gcp"],
+    "phân tích dữ liệu": ["data analysis"],
+    "khoa học dữ liệu": ["data science"],
+    "dữ liệu lớn": ["big data"],
+    "trải nghiệm người dùng": ["ux"],
+    "giao diện người dùng": ["ui"],
+    "tiếp thị số": ["digital marketing"],
+    "làm việc nhóm": ["teamwork"],
+    "giao tiếp": ["communication"],
+    "lãnh đạo": ["leadership"],
+}
+
 stop_words_vi = {
     "và",
     "là",
@@ -1,8 +1,8 @@
+import json
 import pandas as pd
 import numpy as np
 import re
-from typing import Optional, List
-from constants import stop_words_vi
+from typing import Iterator, Optional, List
 
 
 def load_data(file_path: str) -> pd.DataFrame:
@@ -16,7 +16,7 @@ def load_data(file_path: str) -> pd.DataFrame:
     pd.DataFrame: Dữ liệu được đọc từ file.
     """
     try:
-        data = pd.read_json(file_path)
+        data = pd.read_json(file_path, lines=file_path.endswith(".jsonl"))
         print(f"Data loaded successfully with {data.shape[0]} records.")
         return data
     except Exception as e:
@@ -24,6 +24,76 @@ def load_data(file_path: str) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+JSON_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_records(file_path: str, buffer_size: int = 1 << 20) -> Iterator[dict]:
+    """
+    Đọc từng bản ghi từ file JSON (mảng JSON hoặc JSON Lines) mà không nạp cả file.
+
+    Parameters:
+    file_path (str): Đường dẫn tới file JSON/JSONL.
+    buffer_size (int): Số ký tự đọc mỗi lần.
+
+    Yields:
+    dict: Từng bản ghi theo thứ tự trong file.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+        in_array = None
+        while True:
+            # Bỏ dấu phân cách giữa các bản ghi (khoảng trắng, dấu phẩy, xuống dòng)
+            pos = JSON_SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer):
+                if in_array is None:
+                    in_array = buffer[pos] == "["
+                    if in_array:
+                        pos += 1
+                    continue
+                if in_array and buffer[pos] == "]":
+                    return
+                try:
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield record
+                    continue
+            elif eof:
+                return
+            # Hết buffer hoặc bản ghi bị cắt ở cuối: chỉ cắt phần đã đọc khi nạp thêm
+            chunk = f.read(buffer_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+
+def load_data_chunks(file_path: str, chunk_size: int = 5000) -> Iterator[pd.DataFrame]:
+    """
+    Nạp dữ liệu theo từng khối cố định để bộ nhớ không phụ thuộc kích thước file.
+
+    Parameters:
+    file_path (str): Đường dẫn tới file JSON (mảng) hoặc JSON Lines.
+    chunk_size (int): Số bản ghi mỗi khối.
+
+    Yields:
+    pd.DataFrame: Từng khối dữ liệu.
+    """
+    records = []
+    total = 0
+    for record in iter_json_records(file_path):
+        records.append(record)
+        if len(records) == chunk_size:
+            total += len(records)
+            yield pd.DataFrame.from_records(records)
+            records = []
+    if records:
+        total += len(records)
+        yield pd.DataFrame.from_records(records)
+    print(f"Data streamed successfully with {total} records.")
+
+
 # Function to normalize 'experience' field into numerical format
 def normalize_experience(experience: str) -> float:
     """
@@ -129,13 +199,13 @@ def handle_missing_values(
     return data
 
 
-import spacy
-
-nlp = spacy.load("xx_sent_ud_sm")
-
-import xx_sent_ud_sm
-
-nlp = xx_sent_ud_sm.load()
+from nlp_stage import (
+    nlp,
+    parse_texts,
+    remove_stop_words,
+    to_parsed_doc,
+    doc_column,
+)
 
 
 # Hàm tiền xử lý văn bản
@@ -151,27 +221,49 @@ def preprocess_text(text: str) -> str:
     """
     if not isinstance(text, str):
         return text
-    doc = nlp(text)
-    # Giữ lại token không nằm trong stop_words_vi
-    return " ".join(
-        [token.text for token in doc if token.text.lower() not in stop_words_vi]
-    )
+    return remove_stop_words(to_parsed_doc(nlp(text)))
 
 
 # Hàm áp dụng tiền xử lý văn bản cho các cột trong DataFrame
-def apply_text_preprocessing(data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+def apply_text_preprocessing(
+    data: pd.DataFrame,
+    columns: List[str],
+    batch_size: int = 256,
+    n_process: int = 1,
+    keep_docs: Optional[List[str]] = None,
+) -> pd.DataFrame:
     """
     Áp dụng tiền xử lý văn bản cho các cột được chỉ định.
 
+    Với các cột trong `keep_docs`, văn bản gốc được phân tích đầy đủ (kèm thực
+    thể) và kết quả được giữ ở cột tạm `<col>__doc` để bước trích xuất dùng lại
+    thay vì chạy spaCy lần thứ hai.
+
     Parameters:
     data (pd.DataFrame): DataFrame đầu vào.
     columns (List[str]): Danh sách các cột cần tiền xử lý văn bản.
+    batch_size (int): Số văn bản trong mỗi batch của nlp.pipe.
+    n_process (int): Số tiến trình spaCy chạy song song.
+    keep_docs (List[str], optional): Các cột cần giữ lại kết quả phân tích.
 
     Returns:
     pd.DataFrame: DataFrame sau khi áp dụng tiền xử lý.
     """
+    keep_docs = keep_docs or []
     for col in columns:
-        data[col] = data[col].apply(preprocess_text)
+        texts = data[col].tolist()
+        parsed = parse_texts(
+            texts,
+            batch_size=batch_size,
+            n_process=n_process,
+            with_entities=col in keep_docs,
+        )
+        if col in keep_docs:
+            data[doc_column(col)] = pd.Series(parsed, index=data.index, dtype=object)
+        data[col] = [
+            remove_stop_words(doc) if doc is not None else text
+            for text, doc in zip(texts, parsed)
+        ]
     print(f"Text preprocessing applied on columns: {columns}")
     return data
 
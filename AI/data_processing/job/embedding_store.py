@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Kho embedding chỉ ghi nối (append-only) trên đĩa.
+
+    Mỗi cấu hình embedding (model, max_length, pooling, ...) có một thư mục
+    riêng gồm:
+        - meta.json: cấu hình và số chiều.
+        - vectors.f32: ma trận float32 ghi nối theo hàng, đọc bằng np.memmap.
+        - keys.txt: mã băm văn bản của từng hàng, mỗi dòng một khóa.
+
+    Vector được ghi và fsync trước khóa, nên sau một lần chạy bị ngắt giữa chừng
+    chỉ những hàng có đủ cả vector lẫn khóa được giữ lại; lần chạy sau tiếp tục
+    từ đó và bỏ qua các văn bản đã có.
+    """
+
+    def __init__(self, root: str, config: Dict, dim: int):
+        self.config = dict(config)
+        self.dim = dim
+        namespace = hashlib.sha1(
+            json.dumps(self.config, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self.path = os.path.join(root, namespace)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.keys_path = os.path.join(self.path, "keys.txt")
+        os.makedirs(self.path, exist_ok=True)
+
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dim"] != dim:
+                raise ValueError(
+                    f"Embedding store {self.path} has dim {meta['dim']}, expected {dim}."
+                )
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"config": self.config, "dim": dim}, f, indent=2)
+
+        self.index: Dict[str, int] = {}
+        self.rows = 0
+        self._recover()
+
+    def _recover(self):
+        keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, encoding="utf-8") as f:
+                keys = [line.rstrip("\n") for line in f if line.endswith("\n")]
+        row_bytes = self.dim * np.dtype(np.float32).itemsize
+        rows = (
+            os.path.getsize(self.vectors_path) // row_bytes
+            if os.path.exists(self.vectors_path)
+            else 0
+        )
+        # Cắt bỏ phần ghi dở của lần chạy trước để vector và khóa khớp nhau
+        count = min(len(keys), rows)
+        keys = keys[:count]
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(count * row_bytes)
+        with open(self.keys_path, "w", encoding="utf-8") as f:
+            f.writelines(key + "\n" for key in keys)
+        self.rows = count
+        self.index = {}
+        for row, key in enumerate(keys):
+            self.index.setdefault(key, row)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def append(self, keys: List[str], vectors: np.ndarray):
+        """
+        Ghi nối một batch embedding vào kho.
+
+        Parameters:
+            keys (List[str]): Mã băm văn bản của từng hàng.
+            vectors (np.ndarray): Ma trận (len(keys), dim).
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(keys), self.dim):
+            raise ValueError(
+                f"Expected vectors of shape {(len(keys), self.dim)}, got {vectors.shape}."
+            )
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.keys_path, "a", encoding="utf-8") as f:
+            f.writelines(key + "\n" for key in keys)
+            f.flush()
+            os.fsync(f.fileno())
+        for offset, key in enumerate(keys):
+            self.index.setdefault(key, self.rows + offset)
+        self.rows += len(keys)
+
+    def vectors(self) -> np.ndarray:
+        """Ánh xạ bộ nhớ toàn bộ ma trận embedding đã ghi (chỉ đọc)."""
+        if not self.rows:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim)
+        )
+
+    def get_or_compute(
+        self,
+        texts: List[str],
+        compute: Callable[[List[str]], np.ndarray],
+        write_batch_size: int = 1024,
+    ) -> np.ndarray:
+        """
+        Lấy embedding của các văn bản, chỉ tính (và ghi nối) các văn bản chưa có.
+
+        Parameters:
+            texts (List[str]): Danh sách văn bản.
+            compute (Callable): Hàm tính embedding cho danh sách văn bản.
+            write_batch_size (int): Số văn bản mỗi lần tính rồi ghi xuống đĩa;
+                đây cũng là lượng công việc tối đa bị mất khi tiến trình bị ngắt.
+
+        Returns:
+            np.ndarray: Ma trận embedding theo đúng thứ tự `texts`.
+        """
+        keys = [text_hash(text) for text in texts]
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index and key not in missing:
+                missing[key] = text
+        print(
+            f"Embedding store: {len(set(keys)) - len(missing)} cached, "
+            f"{len(missing)} to compute."
+        )
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), write_batch_size):
+            batch = pending[start : start + write_batch_size]
+            self.append([key for key, _ in batch], compute([text for _, text in batch]))
+
+        rows = np.fromiter(
+            (self.index[key] for key in keys), dtype=np.int64, count=len(keys)
+        )
+        return np.asarray(self.vectors()[rows])
+
+
+def open_embedding_store(
+    root: Optional[str],
+    model_id: str,
+    max_length: int,
+    pooling: str,
+    dim: int,
+    **options,
+) -> Optional[EmbeddingStore]:
+    """
+    Mở kho embedding cho một cấu hình; trả về None khi không dùng cache.
+
+    Parameters:
+        root (str, optional): Thư mục gốc của kho.
+        model_id (str): Tên model.
+        max_length (int): Độ dài tối đa khi embedding.
+        pooling (str): Cách gộp token.
+        dim (int): Số chiều embedding.
+        **options: Các tùy chọn khác ảnh hưởng tới vector (chuẩn hóa, độ chính xác).
+
+    Returns:
+        EmbeddingStore, optional: Kho embedding.
+    """
+    if not root:
+        return None
+    config = {"model_id": model_id, "max_length": max_length, "pooling": pooling}
+    config.update(options)
+    return EmbeddingStore(root, config, dim)
@@ -1,20 +1,16 @@
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional
 import pandas as pd
-
-import spacy
-
-nlp = spacy.load("xx_sent_ud_sm")
-
-import xx_sent_ud_sm
-
-nlp = xx_sent_ud_sm.load()
+from skill_matcher import SkillMatcher, get_skill_matcher
+from nlp_stage import ParsedDoc, nlp, to_parsed_doc, doc_column
 
 
 def extract_requirements(
     text: str,
     skill_dict: Optional[List[str]] = None,
     ner_method: str = "spacy",
+    skill_matcher: Optional[SkillMatcher] = None,
+    docs: Optional[List[Optional[ParsedDoc]]] = None,
 ) -> List[str]:
     """
     Trích xuất kỹ năng, bằng cấp và kinh nghiệm từ văn bản mô tả công việc.
@@ -23,6 +19,10 @@ def extract_requirements(
         text (str): Văn bản chứa yêu cầu công việc.
         skill_dict (List[str], optional): Danh sách các kỹ năng chuẩn.
         ner_method (str): Phương pháp NER ("spacy" hoặc "underthesea").
+        skill_matcher (SkillMatcher, optional): Bộ so khớp đã biên dịch; nếu không
+            truyền vào sẽ dùng bộ so khớp được cache cho skill_dict.
+        docs (List[ParsedDoc], optional): Kết quả phân tích sẵn của các phần văn
+            bản; nếu có thì dùng lại thực thể thay vì chạy spaCy lần nữa.
 
     Returns:
         List[str]: Danh sách các yêu cầu được trích xuất.
@@ -34,20 +34,24 @@ def extract_requirements(
 
     # Sử dụng phương pháp NER theo tùy chọn
     if ner_method == "spacy":
-        doc = nlp(text)
+        if docs is None:
+            docs = [to_parsed_doc(nlp(text))]
         extracted.update(
-            ent.text
-            for ent in doc.ents
-            if ent.label_ in ["SKILL", "PRODUCT", "ORG", "PERSON"]
+            ent_text
+            for doc in docs
+            if doc is not None
+            for ent_text, label in doc.entities
+            if label in ["SKILL", "PRODUCT", "ORG", "PERSON"]
         )
     # elif ner_method == "underthesea":
     #     ner_results = ner(text)
     #     extracted.update(result[0] for result in ner_results if result[3] in ["B-SKILL", "B-ORG", "B-PER"])
 
-    # Trích xuất dựa trên từ điển kỹ năng
-    if skill_dict:
-        text_lower = text.lower()
-        extracted.update(skill for skill in skill_dict if skill.lower() in text_lower)
+    # Trích xuất dựa trên từ điển kỹ năng (một lần duyệt Aho–Corasick)
+    if skill_matcher is None and skill_dict:
+        skill_matcher = get_skill_matcher(skill_dict)
+    if skill_matcher is not None:
+        extracted.update(skill_matcher.find(text))
 
     # Kiểm tra các mẫu kinh nghiệm và bằng cấp trong văn bản
     experience_patterns = [
@@ -74,15 +78,20 @@ def apply_extraction(
     columns: List[str],
     skill_dict: Optional[List[str]] = None,
     ner_method: str = "spacy",
+    skill_aliases: Optional[Dict[str, List[str]]] = None,
 ) -> pd.DataFrame:
     """
     Áp dụng trích xuất yêu cầu cho các cột nhất định trong DataFrame.
 
+    Nếu bước tiền xử lý đã giữ lại kết quả phân tích (cột `<col>__doc`) cho mọi
+    cột trong `columns`, thực thể được lấy từ đó; các cột tạm bị xóa sau bước này.
+
     Parameters:
         data (pd.DataFrame): Dữ liệu gốc.
         columns (List[str]): Danh sách các cột cần áp dụng trích xuất.
         skill_dict (List[str], optional): Danh sách kỹ năng chuẩn.
         ner_method (str): Phương pháp NER ("spacy" hoặc "underthesea").
+        skill_aliases (Dict[str, List[str]], optional): Từ đồng nghĩa của kỹ năng.
 
     Returns:
         pd.DataFrame: DataFrame sau khi áp dụng trích xuất.
@@ -91,10 +100,25 @@ def apply_extraction(
         lambda row: " ".join(row.values.astype(str)), axis=1
     )
     print(data["combined_text"].head())
-    data["skills"] = data["combined_text"].apply(
-        lambda x: extract_requirements(x, skill_dict, ner_method)
-    )
-    return data.drop(columns=["combined_text"])
+    matcher = get_skill_matcher(skill_dict, skill_aliases) if skill_dict else None
+    doc_columns = [doc_column(col) for col in columns]
+    if all(col in data.columns for col in doc_columns):
+        data["skills"] = [
+            extract_requirements(
+                text, skill_dict, ner_method, skill_matcher=matcher, docs=list(docs)
+            )
+            for text, *docs in zip(
+                data["combined_text"], *(data[col] for col in doc_columns)
+            )
+        ]
+    else:
+        data["skills"] = data["combined_text"].apply(
+            lambda x: extract_requirements(
+                x, skill_dict, ner_method, skill_matcher=matcher
+            )
+        )
+    stale = [col for col in doc_columns if col in data.columns]
+    return data.drop(columns=["combined_text"] + stale)
 
 
 def separate_features(data: pd.DataFrame, column: str) -> pd.DataFrame:
@@ -0,0 +1,82 @@
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+Matrix = Union[np.ndarray, sparse.spmatrix]
+
+
+class FeatureStore:
+    """
+    Kho các khối đặc trưng căn theo hàng với một DataFrame.
+
+    Mỗi khối là một ma trận liền mạch: embedding/PCA ở dạng np.ndarray float32,
+    TF-IDF ở dạng scipy.sparse CSR. Các bước sau lấy thẳng ma trận theo tên khối
+    thay vì tách hàng trăm cột khỏi DataFrame. Các phép biến đổi đã fit để tạo
+    ra một khối (ví dụ PCA) được giữ trong `transforms` để áp dụng cho dữ liệu mới.
+    """
+
+    def __init__(self, index: pd.Index):
+        self.index = index
+        self.blocks: Dict[str, Matrix] = {}
+        self.transforms: Dict[str, object] = {}
+
+    def add(self, name: str, matrix: Matrix) -> Matrix:
+        """
+        Thêm (hoặc thay thế) một khối đặc trưng.
+
+        Parameters:
+            name (str): Tên khối, ví dụ "jd_embedding".
+            matrix (Matrix): Ma trận dày hoặc thưa có số hàng bằng độ dài index.
+
+        Returns:
+            Matrix: Khối đã được chuẩn hóa kiểu dữ liệu.
+        """
+        if matrix.shape[0] != len(self.index):
+            raise ValueError(
+                f"Block '{name}' has {matrix.shape[0]} rows, "
+                f"expected {len(self.index)}."
+            )
+        if sparse.issparse(matrix):
+            matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        else:
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.blocks[name] = matrix
+        return matrix
+
+    def get(self, name: str) -> Matrix:
+        return self.blocks[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.blocks
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.blocks)
+
+    def dense(self, names: List[str]) -> np.ndarray:
+        """
+        Ghép ngang các khối thành một ma trận dày (khối thưa được chuyển sang dày).
+
+        Parameters:
+            names (List[str]): Tên các khối cần ghép.
+
+        Returns:
+            np.ndarray: Ma trận float32.
+        """
+        matrices = [
+            block.toarray() if sparse.issparse(block) else block
+            for block in (self.blocks[name] for name in names)
+        ]
+        return matrices[0] if len(matrices) == 1 else np.hstack(matrices)
+
+    def nbytes(self, name: Optional[str] = None) -> int:
+        """Dung lượng bộ nhớ của một khối (hoặc toàn bộ kho) tính bằng byte."""
+        names = [name] if name else list(self.blocks)
+        total = 0
+        for block in (self.blocks[n] for n in names):
+            if sparse.issparse(block):
+                total += block.data.nbytes + block.indices.nbytes + block.indptr.nbytes
+            else:
+                total += block.nbytes
+        return total
@@ -0,0 +1,124 @@
+import hashlib
+import inspect
+import json
+import os
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_table, save_table
+
+FINGERPRINT_COLUMNS = ["title", "company", "jd", "requirements"]
+
+
+def processing_version(*components) -> str:
+    """
+    Tạo mã phiên bản cho bước làm sạch từ các từ điển/tập từ và mã nguồn dùng
+    trong bước đó. Đổi từ điển kỹ năng, từ dừng hay mã làm sạch thì mã phiên
+    bản đổi theo, nên kết quả cũ trong cache không bị dùng lại.
+
+    Parameters:
+        components: Module/hàm (băm theo mã nguồn) hoặc dữ liệu như dict, list,
+            set (băm theo nội dung).
+
+    Returns:
+        str: Mã băm SHA-1 của tất cả thành phần.
+    """
+
+    def canonical(value):
+        # set không có thứ tự cố định giữa các lần chạy nên phải sắp xếp
+        if isinstance(value, (set, frozenset)):
+            return sorted(canonical(item) for item in value)
+        if isinstance(value, dict):
+            return {str(key): canonical(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(item) for item in value]
+        return value
+
+    digest = hashlib.sha1()
+    for component in components:
+        if inspect.ismodule(component) or inspect.isfunction(component):
+            payload = inspect.getsource(component)
+        else:
+            payload = json.dumps(
+                canonical(component), ensure_ascii=False, sort_keys=True, default=str
+            )
+        digest.update(payload.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def fingerprint_records(
+    data: pd.DataFrame,
+    columns: Sequence[str] = FINGERPRINT_COLUMNS,
+    version: str = "",
+) -> pd.Series:
+    """
+    Tạo mã băm nội dung cho từng bản ghi dựa trên các cột gốc.
+
+    Parameters:
+        data (pd.DataFrame): Dữ liệu gốc (trước khi làm sạch).
+        columns (Sequence[str]): Các cột dùng để tạo mã băm.
+        version (str): Mã phiên bản bước xử lý (`processing_version`) được gộp
+            vào mã băm.
+
+    Returns:
+        pd.Series: Mã băm SHA-1 của từng bản ghi, cùng index với đầu vào.
+    """
+    columns = [col for col in columns if col in data.columns]
+
+    def normalize(value):
+        # NaN khác NaN nên phải quy về None để mã băm ổn định giữa các lần chạy
+        if isinstance(value, float) and np.isnan(value):
+            return None
+        return value
+
+    def fingerprint(row) -> str:
+        payload = json.dumps(
+            [version] + [normalize(value) for value in row],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    return pd.Series(
+        [fingerprint(row) for row in data[columns].itertuples(index=False)],
+        index=data.index,
+    )
+
+
+def split_cached(
+    data: pd.DataFrame, cache_path: str, key: str = "content_hash"
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Tách dữ liệu thành phần đã có trong cache và phần mới/đã thay đổi.
+
+    Parameters:
+        data (pd.DataFrame): Dữ liệu gốc có cột mã băm.
+        cache_path (str): Đường dẫn file cache của lần chạy trước.
+        key (str): Tên cột mã băm.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (bản ghi đã xử lý lấy từ cache,
+        bản ghi gốc cần xử lý).
+    """
+    if not os.path.exists(cache_path):
+        return pd.DataFrame(), data
+    cached = load_table(cache_path)
+    cached = cached[cached[key].isin(data[key])]
+    new = data[~data[key].isin(cached[key])]
+    print(f"Reusing {cached.shape[0]} cached records, processing {new.shape[0]}.")
+    return cached, new
+
+
+def save_cache(data: pd.DataFrame, cache_path: str):
+    """
+    Lưu các bản ghi đã xử lý để lần chạy sau dùng lại.
+
+    Parameters:
+        data (pd.DataFrame): Dữ liệu đã làm sạch và trích xuất đặc trưng.
+        cache_path (str): Đường dẫn file cache.
+    """
+    save_table(data, cache_path)
@@ -0,0 +1,68 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import xx_sent_ud_sm
+
+from constants import stop_words_vi
+
+# Model spaCy dùng chung cho data_cleaning và feature_extraction (chỉ nạp một lần)
+nlp = xx_sent_ud_sm.load()
+
+
+class ParsedDoc(NamedTuple):
+    """Biểu diễn gọn của một Doc spaCy: danh sách token và thực thể (text, nhãn)."""
+
+    tokens: Tuple[str, ...]
+    entities: Tuple[Tuple[str, str], ...]
+
+
+def to_parsed_doc(doc) -> ParsedDoc:
+    return ParsedDoc(
+        tuple(token.text for token in doc),
+        tuple((ent.text, ent.label_) for ent in doc.ents),
+    )
+
+
+def parse_texts(
+    texts: List,
+    batch_size: int = 256,
+    n_process: int = 1,
+    with_entities: bool = False,
+) -> List[Optional[ParsedDoc]]:
+    """
+    Phân tích danh sách văn bản bằng nlp.pipe, mỗi văn bản khác nhau chỉ một lần.
+
+    Parameters:
+        texts (List): Danh sách văn bản (có thể chứa NaN/None).
+        batch_size (int): Số văn bản trong mỗi batch của nlp.pipe.
+        n_process (int): Số tiến trình chạy song song.
+        with_entities (bool): Chạy đủ pipeline để lấy thực thể; nếu False chỉ
+            dùng tokenizer.
+
+    Returns:
+        List[Optional[ParsedDoc]]: Kết quả theo đúng thứ tự đầu vào, None với
+        giá trị không phải chuỗi.
+    """
+    texts = list(texts)
+    valid = [text if isinstance(text, str) else None for text in texts]
+    codes, uniques = pd.factorize(pd.Series(valid, dtype=object))
+    docs = nlp.pipe(
+        uniques,
+        batch_size=batch_size,
+        n_process=n_process,
+        disable=[] if with_entities else nlp.pipe_names,
+    )
+    parsed = [to_parsed_doc(doc) for doc in docs]
+    return [parsed[code] if code >= 0 else None for code in codes]
+
+
+def remove_stop_words(parsed: ParsedDoc) -> str:
+    # Giữ lại token không nằm trong stop_words_vi
+    return " ".join(
+        [token for token in parsed.tokens if token.lower() not in stop_words_vi]
+    )
+
+
+def doc_column(column: str) -> str:
+    """Tên cột tạm giữ ParsedDoc của `column` giữa các bước của pipeline."""
+    return f"{column}__doc"
@@ -1,7 +1,7 @@
 # pipeline.py
 """
 Pipeline chính cho quy trình phân tích dữ liệu CV và phân cụm công việc.
-Dùng để xử lý từ việc làm sạch dữ liệu, trích xuất đặc trưng, vector hóa, 
+Dùng để xử lý từ việc làm sạch dữ liệu, trích xuất đặc trưng, vector hóa,
 phân cụm và tạo nhãn mô tả cho từng cụm công việc.
 
 Modules:
@@ -9,13 +9,28 @@ Modules:
     - feature_extraction: Trích xuất các kỹ năng, bằng cấp, kinh nghiệm từ văn bản.
     - vectorization: Tạo embeddings cho văn bản và thực hiện TF-IDF.
     - clustering: Áp dụng KMeans và DBSCAN, gán nhãn cho các cụm.
+    - artifacts: Lưu/nạp kết quả từng bước (Parquet + .npy).
+    - incremental: Mã băm nội dung và cache cho chế độ chạy tăng dần.
+    - categorizer: Gán nhóm công việc cho tin mới từ PCA/scaler/tâm cụm đã lưu.
     - constants: Chứa các từ dừng tiếng Việt, từ điển kỹ năng, bản đồ ngành nghề và vị trí.
 """
 
 # Import cần thiết
+import os
+from typing import Iterator, Optional
+
+import numpy as np
 import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from categorizer import JobCategorizer
+import data_cleaning
+import feature_extraction
+import nlp_stage
+import skill_matcher
 from data_cleaning import (
     load_data,
+    load_data_chunks,
     split_requirements,
     remove_duplicates,
     handle_missing_values,
@@ -24,52 +39,230 @@ from data_cleaning import (
     apply_text_preprocessing,
 )
 from feature_extraction import apply_extraction, separate_features, normalize_columns
-from vectorization import vectorize_data
+from vectorization import MODEL_NAME, vectorize_data
+from projection import Projection
 from clustering import (
     standardize_data,
-    find_optimal_kmeans_clusters,
-    apply_kmeans,
+    select_kmeans_clusters,
+    fit_kmeans,
+    predict_clusters,
     apply_dbscan,
+    build_radius_graph,
     reduce_dimensions,
     visualize_clusters,
     assign_cluster_labels_ngrams,
 )
-from constants import skill_dict, industry_map, position_map
+from artifacts import (
+    ARTIFACT_DIR,
+    has_stage,
+    load_stage,
+    save_partitioned_stage,
+    save_stage,
+)
+from incremental import (
+    fingerprint_records,
+    processing_version,
+    split_cached,
+    save_cache,
+)
+from constants import (
+    skill_dict,
+    skill_aliases,
+    industry_map,
+    position_map,
+    stop_words_vi,
+)
 
 
-# Khởi tạo pipeline xử lý chính
-def main_pipeline(file_path: str) -> pd.DataFrame:
+def clean_and_extract(data: pd.DataFrame) -> pd.DataFrame:
     """
-    Pipeline chính thực hiện các bước từ nạp dữ liệu, làm sạch, trích xuất đặc trưng,
-    vector hóa, phân cụm và gán nhãn cho cụm.
+    Làm sạch dữ liệu gốc, trích xuất kỹ năng và chuẩn hóa ngành nghề/vị trí.
 
     Parameters:
-        file_path (str): Đường dẫn đến file JSON chứa dữ liệu.
+        data (pd.DataFrame): Dữ liệu gốc đã loại bỏ trùng lặp.
 
     Returns:
-        pd.DataFrame: DataFrame sau khi thực hiện tất cả các bước tiền xử lý và phân cụm.
+        pd.DataFrame: Dữ liệu đã làm sạch và trích xuất đặc trưng.
     """
-    # Step 1: Load và làm sạch dữ liệu
-    data = load_data(file_path)
-    data = remove_duplicates(data, subset=["title", "company", "jd"])
     data = split_requirements(data)
     data = handle_missing_values(data, important_cols=["industry", "position", "jd"])
+    # context/jd được phân tích đầy đủ một lần, bước trích xuất dùng lại kết quả
     data = apply_text_preprocessing(
         data,
         columns=["title", "company", "industry", "position", "jd", "context", "degree"],
+        keep_docs=["context", "jd"],
     )
     data = apply_text_normalization(
         data, columns=["title", "company", "industry", "position", "jd"]
     )
     data = standardize_salary(data, salary_col="salary")
 
-    # Step 2: Trích xuất kỹ năng và chuẩn hóa cột ngành nghề/vị trí
-    data = apply_extraction(data, columns=["context", "jd"], skill_dict=skill_dict)
+    # Trích xuất kỹ năng và chuẩn hóa cột ngành nghề/vị trí
+    data = apply_extraction(
+        data,
+        columns=["context", "jd"],
+        skill_dict=skill_dict,
+        skill_aliases=skill_aliases,
+    )
     # data = separate_features(data, column="skills")
     data = normalize_columns(data, industry_map=industry_map, position_map=position_map)
+    return data
+
+
+# Mã phiên bản của bước làm sạch, gộp vào content_hash: bản ghi trong cache chỉ
+# được dùng lại khi từ điển, từ dừng, mô hình spaCy và mã làm sạch không đổi
+PROCESSING_VERSION = processing_version(
+    skill_dict,
+    skill_aliases,
+    stop_words_vi,
+    industry_map,
+    position_map,
+    {key: nlp_stage.nlp.meta.get(key) for key in ("name", "version")},
+    data_cleaning,
+    feature_extraction,
+    nlp_stage,
+    skill_matcher,
+    clean_and_extract,
+)
+
+
+def iter_preprocessed_chunks(
+    file_path: str, chunk_size: int = 5000
+) -> Iterator[pd.DataFrame]:
+    """
+    Làm sạch và trích xuất đặc trưng theo từng khối. Bộ nhớ chỉ phụ thuộc
+    `chunk_size`, không phụ thuộc kích thước file: trùng lặp chỉ được loại trong
+    từng khối, mỗi bản ghi mang cột `dedupe_key` để `load_preprocessed` loại
+    trùng lặp giữa các khối khi nạp lại toàn bộ bảng.
+
+    Parameters:
+        file_path (str): Đường dẫn đến file JSON (mảng) hoặc JSON Lines.
+        chunk_size (int): Số bản ghi mỗi khối.
+
+    Yields:
+        pd.DataFrame: Từng khối đã làm sạch.
+    """
+    for chunk in load_data_chunks(file_path, chunk_size=chunk_size):
+        chunk = chunk.copy()
+        chunk["dedupe_key"] = fingerprint_records(chunk, ["title", "company", "jd"])
+        chunk = chunk[~chunk["dedupe_key"].duplicated()].copy()
+        chunk["content_hash"] = fingerprint_records(chunk, version=PROCESSING_VERSION)
+        yield clean_and_extract(chunk)
+
+
+def stream_preprocess(
+    file_path: str,
+    chunk_size: int = 5000,
+    stage: str = "preprocessed",
+    root: str = ARTIFACT_DIR,
+) -> str:
+    """
+    Tiền xử lý theo luồng và ghi thẳng từng khối thành một partition Parquet
+    của bước `stage` trong kho artifact.
+
+    Parameters:
+        file_path (str): Đường dẫn đến file JSON (mảng) hoặc JSON Lines.
+        chunk_size (int): Số bản ghi mỗi khối.
+        stage (str): Tên bước được lưu.
+        root (str): Thư mục gốc của kho artifact.
+
+    Returns:
+        str: Thư mục của bước vừa lưu.
+    """
+    return save_partitioned_stage(
+        stage, iter_preprocessed_chunks(file_path, chunk_size), root=root
+    )
+
+
+def load_preprocessed() -> pd.DataFrame:
+    """
+    Nạp bước "preprocessed"; với bước ghi theo luồng, bản ghi trùng lặp giữa
+    các partition được loại tại đây, khi toàn bộ bảng đã nằm trong bộ nhớ.
+
+    Returns:
+        pd.DataFrame: Dữ liệu đã làm sạch.
+    """
+    data, _ = load_stage("preprocessed")
+    if "dedupe_key" in data.columns:
+        data = remove_duplicates(data, subset=["dedupe_key"])
+        data = data.drop(columns="dedupe_key").reset_index(drop=True)
+    return data
 
-    # Save data
-    data.to_csv("./data/job_preprocessed.csv", index=False)
+
+# Khởi tạo pipeline xử lý chính
+def main_pipeline(
+    file_path: str,
+    cache_dir: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    resume: bool = False,
+    output_stage: Optional[str] = "labeled",
+    minibatch: bool = False,
+) -> pd.DataFrame:
+    """
+    Pipeline chính thực hiện các bước từ nạp dữ liệu, làm sạch, trích xuất đặc trưng,
+    vector hóa, phân cụm và gán nhãn cho cụm.
+
+    Khi có `cache_dir`, mỗi bản ghi được định danh bằng mã băm nội dung
+    (title, company, jd, requirements) cộng với `PROCESSING_VERSION`: bản ghi
+    không đổi dùng lại kết quả làm sạch, kỹ năng và embedding của lần chạy
+    trước, chỉ bản ghi mới/thay đổi được xử lý lại. Đổi từ điển kỹ năng, từ
+    dừng hay mã làm sạch thì toàn bộ cache làm sạch được tính lại. PCA và phân
+    cụm luôn được fit lại trên toàn bộ dữ liệu.
+
+    Khi có `chunk_size`, bước làm sạch và trích xuất chạy theo luồng
+    (`stream_preprocess`): mỗi khối được ghi thẳng thành một partition của bước
+    "preprocessed", nên bộ nhớ khi nạp và làm sạch không phụ thuộc kích thước
+    file; trùng lặp giữa các khối được loại khi nạp lại bảng. Vector hóa và phân cụm sau đó vẫn cần toàn bộ bảng đã làm sạch. Ở chế
+    độ này `cache_dir` chỉ dùng cho embedding; bước làm sạch không dùng cache
+    vì mỗi khối sẽ phải đọc lại toàn bộ file cache.
+
+    Parameters:
+        file_path (str): Đường dẫn đến file JSON/JSON Lines chứa dữ liệu.
+        cache_dir (str, optional): Thư mục cache cho chế độ chạy tăng dần.
+        chunk_size (int, optional): Số bản ghi mỗi khối khi tiền xử lý theo luồng.
+        resume (bool): Dùng lại bước "preprocessed" đã lưu trong kho artifact
+            thay vì làm sạch và phân tích văn bản lại từ đầu.
+        output_stage (str, optional): Tên bước để lưu kết quả cuối cùng cùng các
+            khối đặc trưng (embedding, TF-IDF, PCA) vào kho artifact, kèm
+            JobCategorizer (categorizer.npz) để gán nhóm cho tin mới và phép chiếu
+            PCA (projection.npz) để dùng lại qua `vectorize_data(projection=...)`.
+        minibatch (bool): Phân cụm bằng MiniBatchKMeans qua partial_fit theo khối.
+
+    Returns:
+        pd.DataFrame: DataFrame sau khi thực hiện tất cả các bước tiền xử lý và phân cụm.
+    """
+    if resume and has_stage("preprocessed"):
+        data = load_preprocessed()
+    elif chunk_size:
+        # Step 1-2: Tiền xử lý theo luồng, chỉ giữ lại dữ liệu đã làm sạch
+        if cache_dir:
+            print("Streaming mode: cleaning cache skipped, embeddings still cached.")
+        stream_preprocess(file_path, chunk_size=chunk_size)
+        data = load_preprocessed()
+    else:
+        # Step 1: Load và làm sạch dữ liệu
+        data = load_data(file_path)
+        data = remove_duplicates(data, subset=["title", "company", "jd"])
+        data["content_hash"] = fingerprint_records(data, version=PROCESSING_VERSION)
+
+        # Step 2: Làm sạch và trích xuất đặc trưng (chỉ bản ghi mới khi có cache)
+        if cache_dir:
+            cache_path = os.path.join(cache_dir, "job_preprocessed.parquet")
+            cached, new = split_cached(data, cache_path)
+            # Bản ghi mới phải qua clean_and_extract trước khi ghép với cache,
+            # nếu không các cột gốc (vd. requirements) lọt vào kết quả
+            if new.empty:
+                data = cached.reset_index(drop=True)
+            elif cached.empty:
+                data = clean_and_extract(new)
+            else:
+                data = pd.concat([cached, clean_and_extract(new)], ignore_index=True)
+            save_cache(data, cache_path)
+        else:
+            data = clean_and_extract(data)
+
+        # Save data
+        save_stage("preprocessed", data)
 
     # Step 3: Vector hóa các đặc trưng bằng embedding và TF-IDF
     embed_fields = [
@@ -85,27 +278,44 @@ def main_pipeline(file_path: str) -> pd.DataFrame:
     data["industry_position"] = (
         data["industry"].fillna("") + " " + data["position"].fillna("")
     )
-    data = vectorize_data(
+    # Cấu hình embedding được lưu cùng categorizer để tin mới embedding giống hệt
+    embedding_config = {
+        "model": MODEL_NAME,
+        "max_length": 256,
+        "pooling": "mean",
+        "normalize": True,
+    }
+    data, features = vectorize_data(
         data,
         embed_fields=embed_fields,
         tfidf_fields=tfidf_fields,
-        embedding_max_length=256,
+        embedding_max_length=embedding_config["max_length"],
         embedding_batch_size=32,
+        embedding_pooling=embedding_config["pooling"],
+        embedding_normalize=embedding_config["normalize"],
         tfidf_max_features=50,
         pca_components=50,
+        cache_dir=cache_dir,
     )
 
     # Step 4: Phân cụm với KMeans và DBSCAN
-    pca_columns = [col for col in data.columns if "embedding_pca" in col]
-    data_scaled = standardize_data(data, pca_columns)
+    scaler = StandardScaler()
+    data_scaled = standardize_data(features.get("embedding_pca"), scaler=scaler)
 
     # KMeans clustering với số cluster tối ưu
-    best_k = find_optimal_kmeans_clusters(data_scaled)
-    data = apply_kmeans(data, data_scaled, n_clusters=best_k)
+    # Chọn k trên mẫu, chỉ fit lại k tốt nhất trên toàn bộ dữ liệu
+    selection = select_kmeans_clusters(data_scaled)
+    best_k = selection["best_k"]
+    kmeans = fit_kmeans(
+        data_scaled, best_k, init=selection["centers"], minibatch=minibatch
+    )
+    data["kmeans_cluster"] = predict_clusters(kmeans, data_scaled)
     print(f"Optimal number of clusters for KMeans: {best_k}")
 
     # DBSCAN clustering
-    data = apply_dbscan(data, data_scaled, eps=0.5, min_samples=5)
+    # Đồ thị lân cận dựng một lần (theo khối), dùng lại được khi dò eps <= 0.5
+    radius_graph = build_radius_graph(data_scaled, radius=0.5)
+    data = apply_dbscan(data, data_scaled, eps=0.5, min_samples=5, graph=radius_graph)
 
     # Step 5: Giảm chiều và trực quan hóa
     pca_2d = reduce_dimensions(data_scaled, n_components=2)
@@ -130,11 +340,25 @@ def main_pipeline(file_path: str) -> pd.DataFrame:
         data["dbscan_cluster"].map(dbscan_labels).fillna("Noise")
     )
 
+    if output_stage:
+        save_stage(output_stage, data, features.blocks)
+        # Lưu PCA, scaler và tâm cụm để gán nhóm cho tin mới mà không fit lại
+        categorizer = JobCategorizer.from_models(
+            features.transforms["embedding_pca"],
+            scaler,
+            kmeans,
+            kmeans_labels,
+            counts=np.bincount(data["kmeans_cluster"], minlength=best_k),
+            embedding_config=embedding_config,
+        )
+        categorizer.save(os.path.join(ARTIFACT_DIR, output_stage, "categorizer.npz"))
+        Projection.from_model(features.transforms["embedding_pca"]).save(
+            os.path.join(ARTIFACT_DIR, output_stage, "projection.npz")
+        )
     return data
 
 
 # Chạy pipeline và lưu kết quả
 if __name__ == "__main__":
-    processed_data = main_pipeline("job_details.json")
-    processed_data.to_csv("job_details_labeled_final.csv", index=False)
+    processed_data = main_pipeline("job_details.json", cache_dir="./data/cache")
     print("Pipeline completed and results saved.")
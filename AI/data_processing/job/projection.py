@@ -0,0 +1,159 @@
+import os
+from typing import Iterator
+
+import numpy as np
+from sklearn.decomposition import PCA, IncrementalPCA
+
+PROJECTION_METHODS = ("auto", "full", "randomized", "incremental")
+
+# Ma trận lớn hơn ngưỡng này (float32) được fit bằng IncrementalPCA theo khối
+MAX_IN_MEMORY_BYTES = 1 << 30
+
+
+def choose_method(
+    n_rows: int,
+    n_features: int,
+    n_components: int,
+    max_bytes: int = MAX_IN_MEMORY_BYTES,
+) -> str:
+    """
+    Chọn cách fit PCA theo kích thước dữ liệu: IncrementalPCA khi ma trận không
+    vừa ngân sách bộ nhớ, randomized SVD khi số thành phần nhỏ so với số chiều,
+    còn lại là PCA đầy đủ.
+    """
+    if n_rows * n_features * 4 > max_bytes:
+        return "incremental"
+    if n_components < 0.8 * min(n_rows, n_features):
+        return "randomized"
+    return "full"
+
+
+def iter_chunks(
+    data: np.ndarray, chunk_size: int, min_last: int = 0
+) -> Iterator[np.ndarray]:
+    # Khối cuối ít hơn `min_last` hàng được gộp vào khối trước đó
+    starts = list(range(0, data.shape[0], chunk_size))
+    if len(starts) > 1 and data.shape[0] - starts[-1] < min_last:
+        starts.pop()
+    for start, end in zip(starts, starts[1:] + [data.shape[0]]):
+        yield np.asarray(data[start:end], dtype=np.float32)
+
+
+def fit_projection(
+    data: np.ndarray,
+    n_components: int,
+    method: str = "auto",
+    chunk_size: int = 8192,
+    random_state: int = 42,
+):
+    """
+    Fit phép chiếu PCA, chọn randomized SVD hoặc IncrementalPCA theo kích thước.
+
+    Parameters:
+        data (np.ndarray): Dữ liệu (có thể là np.memmap; IncrementalPCA chỉ đọc
+            từng khối nên không cần nạp toàn bộ vào RAM).
+        n_components (int): Số thành phần chính.
+        method (str): Một trong PROJECTION_METHODS.
+        chunk_size (int): Số hàng mỗi khối khi fit IncrementalPCA.
+        random_state (int): Seed cho randomized SVD.
+
+    Returns:
+        PCA hoặc IncrementalPCA đã fit.
+    """
+    if method not in PROJECTION_METHODS:
+        raise ValueError(
+            f"Unsupported method: {method}. Use one of {PROJECTION_METHODS}."
+        )
+    if method == "auto":
+        method = choose_method(data.shape[0], data.shape[1], n_components)
+
+    if method == "incremental":
+        # partial_fit cần ít nhất n_components hàng mỗi khối
+        chunk_size = max(chunk_size, n_components)
+        model = IncrementalPCA(n_components=n_components, batch_size=chunk_size)
+        for chunk in iter_chunks(data, chunk_size, min_last=n_components):
+            model.partial_fit(chunk)
+    else:
+        model = PCA(
+            n_components=n_components,
+            svd_solver=method,
+            random_state=random_state if method == "randomized" else None,
+        )
+        model.fit(data)
+    report_explained_variance(model, method)
+    return model
+
+
+def transform_in_chunks(model, data: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Áp dụng phép chiếu đã fit lên từng khối và ghép kết quả (float32)."""
+    if not data.shape[0]:
+        return np.empty((0, len(model.components_)), dtype=np.float32)
+    return np.vstack(
+        [
+            model.transform(chunk).astype(np.float32)
+            for chunk in iter_chunks(data, chunk_size)
+        ]
+    )
+
+
+def report_explained_variance(model, method: str = "") -> dict:
+    """
+    In và trả về tỉ lệ phương sai được giữ lại của phép chiếu.
+
+    Returns:
+        dict: Số thành phần, tổng tỉ lệ phương sai và tỉ lệ tích lũy tại một số mốc.
+    """
+    cumulative = np.cumsum(model.explained_variance_ratio_)
+    marks = sorted(
+        {m for m in (1, 2, 5, 10, 20, 50, len(cumulative)) if m <= len(cumulative)}
+    )
+    report = {
+        "method": method,
+        "n_components": int(len(cumulative)),
+        "explained_variance": round(float(cumulative[-1]), 4),
+        "cumulative": {m: round(float(cumulative[m - 1]), 4) for m in marks},
+    }
+    print(f"PCA explained variance: {report}")
+    return report
+
+
+class Projection:
+    """
+    Phép chiếu PCA đã fit, lưu dạng .npz để chiếu dữ liệu mới mà không fit lại.
+
+    Thuộc tính đặt tên giống PCA của scikit-learn (mean_, components_, ...) nên
+    dùng được ở những chỗ nhận model PCA, ví dụ JobCategorizer.from_models.
+    """
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        components: np.ndarray,
+        explained_variance_ratio: np.ndarray,
+    ):
+        self.mean_ = np.asarray(mean, dtype=np.float32)
+        self.components_ = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio_ = np.asarray(explained_variance_ratio)
+
+    @classmethod
+    def from_model(cls, model) -> "Projection":
+        return cls(model.mean_, model.components_, model.explained_variance_ratio_)
+
+    def transform(self, data: np.ndarray) -> np.ndarray:
+        return (np.asarray(data, dtype=np.float32) - self.mean_) @ self.components_.T
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            mean=self.mean_,
+            components=self.components_,
+            explained_variance_ratio=self.explained_variance_ratio_,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with np.load(path) as arrays:
+            return cls(
+                arrays["mean"], arrays["components"], arrays["explained_variance_ratio"]
+            )
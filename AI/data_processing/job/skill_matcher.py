@@ -0,0 +1,156 @@
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+def normalize_skill_text(text: str) -> str:
+    """
+    Chuẩn hóa văn bản trước khi so khớp: Unicode NFC và chữ thường.
+
+    Parameters:
+        text (str): Văn bản cần chuẩn hóa.
+
+    Returns:
+        str: Văn bản đã chuẩn hóa.
+    """
+    return unicodedata.normalize("NFC", text).lower()
+
+
+class SkillMatcher:
+    """
+    Bộ so khớp kỹ năng dựa trên automaton Aho–Corasick biên dịch sẵn.
+
+    Mọi kỹ năng và từ đồng nghĩa được nạp vào một automaton duy nhất nên mỗi
+    văn bản chỉ cần duyệt một lần, chi phí không tăng theo kích thước từ điển.
+    Khi `word_boundary=True`, một kết quả chỉ được chấp nhận nếu ký tự liền
+    trước và liền sau không phải chữ/số (tránh "go" khớp trong "google").
+    """
+
+    def __init__(
+        self,
+        skills: Iterable[str],
+        aliases: Optional[Dict[str, List[str]]] = None,
+        word_boundary: bool = True,
+    ):
+        self.word_boundary = word_boundary
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, str]]] = [[]]
+
+        patterns = {}
+        for skill in skills:
+            patterns.setdefault(normalize_skill_text(skill), skill)
+        for skill, names in (aliases or {}).items():
+            for name in names:
+                patterns.setdefault(normalize_skill_text(name), skill)
+        for pattern, skill in patterns.items():
+            if pattern:
+                self._add(pattern, skill)
+        self._build()
+
+    def _add(self, pattern: str, skill: str):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((len(pattern), skill))
+
+    def _build(self):
+        # Tính liên kết fail theo BFS và gộp output của trạng thái fail
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = (
+                    self.output[next_state] + self.output[self.fail[next_state]]
+                )
+
+    def find(self, text: str) -> List[str]:
+        """
+        Trả về các kỹ năng xuất hiện trong văn bản, theo thứ tự xuất hiện.
+
+        Parameters:
+            text (str): Văn bản cần trích xuất.
+
+        Returns:
+            List[str]: Danh sách kỹ năng chuẩn (không trùng lặp).
+        """
+        if not isinstance(text, str):
+            return []
+        text = normalize_skill_text(text)
+        found = {}
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, skill in output[state]:
+                if skill in found:
+                    continue
+                if self.word_boundary:
+                    start = end - length + 1
+                    if start > 0 and text[start - 1].isalnum():
+                        continue
+                    if end + 1 < len(text) and text[end + 1].isalnum():
+                        continue
+                found[skill] = None
+        return list(found)
+
+    def match_series(self, texts: pd.Series) -> pd.Series:
+        """
+        Trích xuất kỹ năng cho cả một Series, mỗi văn bản khác nhau chỉ quét một lần.
+
+        Parameters:
+            texts (pd.Series): Series văn bản.
+
+        Returns:
+            pd.Series: Series danh sách kỹ năng, cùng index với đầu vào.
+        """
+        codes, uniques = pd.factorize(texts)
+        matches = [self.find(text) for text in uniques]
+        return pd.Series(
+            [list(matches[code]) if code >= 0 else [] for code in codes],
+            index=texts.index,
+        )
+
+
+@lru_cache(maxsize=8)
+def _cached_matcher(
+    skills: Tuple[str, ...], aliases: Tuple[Tuple[str, Tuple[str, ...]], ...]
+) -> SkillMatcher:
+    return SkillMatcher(skills, {skill: list(names) for skill, names in aliases})
+
+
+def get_skill_matcher(
+    skills: List[str], aliases: Optional[Dict[str, List[str]]] = None
+) -> SkillMatcher:
+    """
+    Lấy SkillMatcher đã biên dịch cho từ điển kỹ năng (được cache theo nội dung).
+
+    Parameters:
+        skills (List[str]): Danh sách kỹ năng chuẩn.
+        aliases (Dict[str, List[str]], optional): Từ đồng nghĩa của từng kỹ năng.
+
+    Returns:
+        SkillMatcher: Bộ so khớp dùng chung.
+    """
+    alias_key = tuple(
+        (skill, tuple(names)) for skill, names in sorted((aliases or {}).items())
+    )
+    return _cached_matcher(tuple(skills), alias_key)
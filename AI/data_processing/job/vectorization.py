@@ -1,56 +1,226 @@
+import copy
+import os
+
 import pandas as pd
 import numpy as np
 import torch
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import PCA
 from transformers import AutoTokenizer, AutoModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
+
+from feature_store import FeatureStore
+from projection import Projection, fit_projection, transform_in_chunks
+from embedding_store import open_embedding_store
 
 # import torch
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # Load model and tokenizer (shared resource across functions)
-tokenizer = AutoTokenizer.from_pretrained("vinai/phobert-base-v2")
-model = AutoModel.from_pretrained("vinai/phobert-base-v2").to(device)
+MODEL_NAME = "vinai/phobert-base-v2"
+tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+model = AutoModel.from_pretrained(MODEL_NAME).to(device)
+
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+# Các biến thể của model theo độ chính xác, tạo khi được dùng lần đầu
+_model_variants = {}
+
+
+def get_model(precision: str = "fp32"):
+    """
+    Lấy model PhoBERT cho độ chính xác yêu cầu.
+
+    - fp32: model gốc.
+    - bf16: model gốc, forward chạy trong torch.autocast với bfloat16.
+    - int8: bản sao trên CPU với các lớp Linear được lượng tử hóa động.
+
+    Parameters:
+        precision (str): Một trong PRECISIONS.
+
+    Returns:
+        Model dùng cho forward.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unsupported precision: {precision}. Use one of {PRECISIONS}."
+        )
+    if precision != "int8":
+        return model
+    if "int8" not in _model_variants:
+        _model_variants["int8"] = torch.quantization.quantize_dynamic(
+            copy.deepcopy(model).cpu(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return _model_variants["int8"]
+
+
+def bucket_by_length(
+    lengths: List[int], max_tokens: int, max_batch_size: Optional[int] = None
+) -> List[List[int]]:
+    """
+    Gom chỉ số văn bản thành các batch có độ dài gần nhau, giới hạn theo tổng số
+    token sau khi padding (số văn bản x độ dài dài nhất trong batch).
+
+    Parameters:
+        lengths (List[int]): Số token của từng văn bản.
+        max_tokens (int): Số token tối đa của một batch sau khi padding.
+        max_batch_size (int, optional): Số văn bản tối đa trong một batch.
+
+    Returns:
+        List[List[int]]: Danh sách batch, mỗi batch là các chỉ số trong `lengths`.
+    """
+    # Văn bản dài nhất đi trước để đỉnh bộ nhớ xuất hiện ngay batch đầu
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches, batch, batch_len = [], [], 0
+    for i in order:
+        width = max(batch_len, lengths[i])
+        full = max_batch_size is not None and len(batch) >= max_batch_size
+        if batch and (full or (len(batch) + 1) * width > max_tokens):
+            batches.append(batch)
+            batch, width = [], lengths[i]
+        batch.append(i)
+        batch_len = width
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+POOLING_MODES = ("cls", "mean", "max")
+
+
+def pool_hidden_states(
+    hidden: torch.Tensor, attention_mask: torch.Tensor, pooling: str = "cls"
+) -> torch.Tensor:
+    """
+    Gộp hidden state của các token thành một vector cho mỗi văn bản.
+
+    Parameters:
+        hidden (torch.Tensor): last_hidden_state, kích thước (batch, seq, hidden).
+        attention_mask (torch.Tensor): Mặt nạ token thật (1) và padding (0).
+        pooling (str): "cls" (token đầu), "mean" (trung bình theo mặt nạ) hoặc
+            "max" (giá trị lớn nhất theo mặt nạ).
+
+    Returns:
+        torch.Tensor: Ma trận (batch, hidden).
+    """
+    if pooling == "cls":
+        return hidden[:, 0, :]
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    if pooling == "mean":
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    if pooling == "max":
+        return (
+            hidden.masked_fill(mask == 0, torch.finfo(hidden.dtype).min)
+            .max(dim=1)
+            .values
+        )
+    raise ValueError(f"Unsupported pooling: {pooling}. Use one of {POOLING_MODES}.")
+
+
+def truncation_stats(lengths: List[int], max_length: int) -> dict:
+    """
+    Thống kê độ dài token (trước khi cắt) so với `max_length`.
+
+    Parameters:
+        lengths (List[int]): Số token của từng văn bản khi chưa cắt.
+        max_length (int): Độ dài tối đa khi embedding.
+
+    Returns:
+        dict: Số văn bản, số/tỉ lệ văn bản bị cắt, độ dài trung bình, p95 và lớn nhất.
+    """
+    lengths = np.asarray(lengths)
+    if not lengths.size:
+        return {"texts": 0, "truncated": 0, "truncated_ratio": 0.0}
+    truncated = int((lengths > max_length).sum())
+    return {
+        "texts": int(lengths.size),
+        "truncated": truncated,
+        "truncated_ratio": round(truncated / lengths.size, 4),
+        "mean_tokens": round(float(lengths.mean()), 1),
+        "p95_tokens": int(np.percentile(lengths, 95)),
+        "max_tokens": int(lengths.max()),
+    }
 
 
 def embed_text_batch(
     texts: List[str],
     max_length: int = 256,
     batch_size: int = 32,
+    max_tokens: Optional[int] = None,
+    precision: str = "fp32",
+    num_threads: Optional[int] = None,
+    pooling: str = "cls",
+    normalize: bool = False,
 ) -> np.ndarray:
     """
     Chuyển đổi danh sách văn bản thành embeddings.
 
+    Văn bản được token hóa một lần, sắp theo độ dài và gom thành các batch theo
+    ngân sách token, nên mỗi batch chỉ padding tới văn bản dài nhất của chính nó.
+    Kết quả được trả về theo đúng thứ tự đầu vào.
+
     Parameters:
         texts (List[str]): Danh sách các chuỗi văn bản.
         max_length (int): Độ dài tối đa của mỗi chuỗi khi embedding.
-        batch_size (int): Kích thước batch khi embedding.
+        batch_size (int): Số văn bản tối đa trong một batch.
+        max_tokens (int, optional): Số token tối đa của một batch sau khi padding;
+            mặc định batch_size * max_length (bằng batch lớn nhất trước đây).
+        precision (str): "fp32", "bf16" (autocast) hoặc "int8" (lượng tử hóa động, CPU).
+        num_threads (int, optional): Số luồng intra-op của torch trên CPU.
+        pooling (str): Cách gộp token, xem `pool_hidden_states`.
+        normalize (bool): Chuẩn hóa L2 từng embedding.
 
     Returns:
         np.ndarray: Ma trận embeddings với mỗi hàng là embedding của một văn bản.
     """
-    all_embeddings = []
-    for i in range(0, len(texts), batch_size):
-        batch_texts = texts[i : i + batch_size]
-        inputs = tokenizer(
-            batch_texts,
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-            max_length=max_length,
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Unsupported pooling: {pooling}. Use one of {POOLING_MODES}.")
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    forward_model = get_model(precision)
+    forward_device = torch.device("cpu") if precision == "int8" else device
+    max_tokens = max_tokens or batch_size * max_length
+
+    if not len(texts):
+        return np.empty((0, forward_model.config.hidden_size), dtype=np.float32)
+    texts = list(texts)
+    # Token hóa không cắt để biết độ dài thật, chỉ token hóa lại các văn bản quá dài
+    input_ids = tokenizer(texts, truncation=False, verbose=False)["input_ids"]
+    full_lengths = [len(ids) for ids in input_ids]
+    long_texts = [i for i, length in enumerate(full_lengths) if length > max_length]
+    if long_texts:
+        truncated = tokenizer(
+            [texts[i] for i in long_texts], truncation=True, max_length=max_length
+        )["input_ids"]
+        for i, ids in zip(long_texts, truncated):
+            input_ids[i] = ids
+    lengths = [len(ids) for ids in input_ids]
+    stats = truncation_stats(full_lengths, max_length)
+    print(f"Token lengths (max_length={max_length}): {stats}")
+
+    hidden_size = forward_model.config.hidden_size
+    all_embeddings = np.empty((len(texts), hidden_size), dtype=np.float32)
+    for batch in bucket_by_length(lengths, max_tokens, max_batch_size=batch_size):
+        inputs = tokenizer.pad(
+            {"input_ids": [input_ids[i] for i in batch]}, return_tensors="pt"
         )
         # Move each tensor in `inputs` to the correct device
-        inputs = {key: tensor.to(device) for key, tensor in inputs.items()}
+        inputs = {key: tensor.to(forward_device) for key, tensor in inputs.items()}
 
-        with torch.no_grad():
-            outputs = model(**inputs)
-        embeddings = (
-            outputs.last_hidden_state[:, 0, :].cpu().numpy()  # CLS token on CPU
-        )
-        all_embeddings.extend(embeddings)
-    return np.array(all_embeddings)
+        with torch.inference_mode(), torch.autocast(
+            device_type=forward_device.type,
+            dtype=torch.bfloat16,
+            enabled=precision == "bf16",
+        ):
+            outputs = forward_model(**inputs)
+            pooled = pool_hidden_states(
+                outputs.last_hidden_state.float(), inputs["attention_mask"], pooling
+            )
+            if normalize:
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        all_embeddings[batch] = pooled.cpu().numpy()
+    return all_embeddings
 
 
 def apply_embeddings(
@@ -58,81 +228,122 @@ def apply_embeddings(
     fields: List[str],
     embedding_max_length: int,
     embedding_batch_size: int,
-) -> pd.DataFrame:
+    cache_dir: Optional[str] = None,
+    features: Optional[FeatureStore] = None,
+    embedding_max_tokens: Optional[int] = None,
+    embedding_precision: str = "fp32",
+    embedding_threads: Optional[int] = None,
+    embedding_pooling: str = "cls",
+    embedding_normalize: bool = False,
+) -> FeatureStore:
     """
-    Áp dụng embedding lên các cột văn bản chỉ định và thêm chúng vào DataFrame.
+    Áp dụng embedding lên các cột văn bản chỉ định, mỗi cột thành một khối
+    `<cột>_embedding` float32 trong FeatureStore.
 
     Parameters:
         data (pd.DataFrame): Dữ liệu gốc.
         fields (List[str]): Danh sách các cột cần áp dụng embedding.
         embedding_max_length (int): Độ dài tối đa cho mỗi chuỗi khi embedding.
         embedding_batch_size (int): Kích thước batch khi embedding.
+        cache_dir (str, optional): Thư mục chứa kho embedding (EmbeddingStore);
+            văn bản đã có trong kho không được tính lại.
+        features (FeatureStore, optional): Kho đặc trưng để thêm khối vào.
+        embedding_max_tokens (int, optional): Ngân sách token cho mỗi batch.
+        embedding_precision (str): Độ chính xác khi forward (xem `get_model`).
+        embedding_threads (int, optional): Số luồng intra-op của torch trên CPU.
+        embedding_pooling (str): "cls", "mean" hoặc "max".
+        embedding_normalize (bool): Chuẩn hóa L2 các embedding.
 
     Returns:
-        pd.DataFrame: Dữ liệu sau khi thêm các embedding.
+        FeatureStore: Kho đặc trưng chứa các khối embedding.
     """
-    for field in fields:
-        embeddings = embed_text_batch(
-            data[field].fillna("").astype(str).tolist(),
+    features = features if features is not None else FeatureStore(data.index)
+
+    def compute(texts: List[str]) -> np.ndarray:
+        return embed_text_batch(
+            texts,
             max_length=embedding_max_length,
             batch_size=embedding_batch_size,
+            max_tokens=embedding_max_tokens,
+            precision=embedding_precision,
+            num_threads=embedding_threads,
+            pooling=embedding_pooling,
+            normalize=embedding_normalize,
         )
-        embedding_df = pd.DataFrame(
-            embeddings,
-            columns=[f"{field}_embedding_{i}" for i in range(embeddings.shape[1])],
-        )
-        data = pd.concat([data.reset_index(drop=True), embedding_df], axis=1)
+
+    store = open_embedding_store(
+        os.path.join(cache_dir, "embeddings") if cache_dir else None,
+        model_id=MODEL_NAME,
+        max_length=embedding_max_length,
+        pooling=embedding_pooling,
+        dim=model.config.hidden_size,
+        normalize=embedding_normalize,
+        precision=embedding_precision,
+    )
+    for field in fields:
+        texts = data[field].fillna("").astype(str).tolist()
+        if store is not None:
+            embeddings = store.get_or_compute(texts, compute)
+        else:
+            embeddings = compute(texts)
+        features.add(f"{field}_embedding", embeddings)
         print(f"Embedding applied to field: {field}")
-    return data
+    return features
 
 
 def apply_tfidf(
-    data: pd.DataFrame, fields: List[str], max_features: int = 50
-) -> pd.DataFrame:
+    data: pd.DataFrame,
+    fields: List[str],
+    max_features: int = 50,
+    features: Optional[FeatureStore] = None,
+) -> FeatureStore:
     """
-    Áp dụng TF-IDF lên các cột văn bản và thêm các đặc trưng vào DataFrame.
+    Áp dụng TF-IDF lên các cột văn bản, mỗi cột thành một khối thưa `<cột>_tfidf`.
 
     Parameters:
         data (pd.DataFrame): Dữ liệu gốc.
         fields (List[str]): Danh sách các cột cần áp dụng TF-IDF.
         max_features (int): Số đặc trưng tối đa cho mỗi trường.
+        features (FeatureStore, optional): Kho đặc trưng để thêm khối vào.
 
     Returns:
-        pd.DataFrame: Dữ liệu sau khi thêm các đặc trưng TF-IDF.
+        FeatureStore: Kho đặc trưng chứa các khối TF-IDF (scipy.sparse CSR).
     """
+    features = features if features is not None else FeatureStore(data.index)
     for field in fields:
-        vectorizer = TfidfVectorizer(max_features=max_features)
-        tfidf_matrix = vectorizer.fit_transform(data[field].fillna(""))
-        tfidf_df = pd.DataFrame(
-            tfidf_matrix.toarray(),
-            columns=[f"{field}_tfidf_{i}" for i in range(tfidf_matrix.shape[1])],
-        )
-        data = pd.concat([data.reset_index(drop=True), tfidf_df], axis=1)
+        vectorizer = TfidfVectorizer(max_features=max_features, dtype=np.float32)
+        features.add(f"{field}_tfidf", vectorizer.fit_transform(data[field].fillna("")))
         print(f"TF-IDF applied to field: {field}")
-    return data
+    return features
 
 
 def reduce_dimensions(
-    data: pd.DataFrame, embedding_columns: List[str], n_components: int = 50
-) -> pd.DataFrame:
+    features: FeatureStore,
+    block_names: List[str],
+    n_components: int = 50,
+    method: str = "auto",
+    projection: Optional[Projection] = None,
+) -> np.ndarray:
     """
-    Giảm chiều các embedding với PCA.
+    Giảm chiều các khối embedding với PCA và lưu kết quả vào khối "embedding_pca".
 
     Parameters:
-        data (pd.DataFrame): Dữ liệu gốc chứa các embedding.
-        embedding_columns (List[str]): Danh sách các cột embedding cần giảm chiều.
+        features (FeatureStore): Kho đặc trưng chứa các khối embedding.
+        block_names (List[str]): Danh sách các khối embedding cần giảm chiều.
         n_components (int): Số thành phần chính sau khi giảm chiều với PCA.
+        method (str): "auto", "full", "randomized" hoặc "incremental"
+            (xem `projection.fit_projection`).
+        projection (Projection, optional): Phép chiếu đã fit từ lần chạy trước;
+            khi có thì chỉ chiếu dữ liệu mà không fit lại.
 
     Returns:
-        pd.DataFrame: Dữ liệu sau khi giảm chiều với PCA.
+        np.ndarray: Ma trận embedding sau khi giảm chiều.
     """
-    embeddings = data[embedding_columns].values
-    pca = PCA(n_components=n_components)
-    reduced_embeddings = pca.fit_transform(embeddings)
-    reduced_df = pd.DataFrame(
-        reduced_embeddings, columns=[f"embedding_pca_{i}" for i in range(n_components)]
-    )
-    return pd.concat([data.reset_index(drop=True), reduced_df], axis=1)
+    embeddings = features.dense(block_names)
+    if projection is None:
+        projection = fit_projection(embeddings, n_components, method=method)
+    features.transforms["embedding_pca"] = projection
+    return features.add("embedding_pca", transform_in_chunks(projection, embeddings))
 
 
 def vectorize_data(
@@ -143,7 +354,15 @@ def vectorize_data(
     embedding_batch_size: int = 32,
     tfidf_max_features: int = 50,
     pca_components: int = 50,
-) -> pd.DataFrame:
+    cache_dir: Optional[str] = None,
+    embedding_max_tokens: Optional[int] = None,
+    embedding_precision: str = "fp32",
+    embedding_threads: Optional[int] = None,
+    embedding_pooling: str = "cls",
+    embedding_normalize: bool = False,
+    pca_method: str = "auto",
+    projection: Optional[Projection] = None,
+) -> Tuple[pd.DataFrame, FeatureStore]:
     """
     Thực hiện toàn bộ quá trình embedding, TF-IDF và giảm chiều.
 
@@ -155,20 +374,47 @@ def vectorize_data(
         embedding_batch_size (int): Kích thước batch khi embedding.
         tfidf_max_features (int): Số đặc trưng tối đa cho TF-IDF.
         pca_components (int): Số thành phần chính sau khi giảm chiều với PCA.
+        cache_dir (str, optional): Thư mục cache embedding giữa các lần chạy.
+        embedding_max_tokens (int, optional): Ngân sách token cho mỗi batch embedding.
+        embedding_precision (str): "fp32", "bf16" hoặc "int8".
+        embedding_threads (int, optional): Số luồng intra-op của torch trên CPU.
+        embedding_pooling (str): "cls", "mean" hoặc "max".
+        embedding_normalize (bool): Chuẩn hóa L2 các embedding.
+        pca_method (str): Cách fit PCA, xem `reduce_dimensions`.
+        projection (Projection, optional): Phép chiếu PCA đã lưu để dùng lại.
 
     Returns:
-        pd.DataFrame: Dữ liệu sau khi áp dụng toàn bộ quy trình vectorization.
+        Tuple[pd.DataFrame, FeatureStore]: Dữ liệu (index được đặt lại) và kho
+        đặc trưng căn theo hàng của nó.
     """
-    data = apply_embeddings(
-        data, embed_fields, embedding_max_length, embedding_batch_size
+    data = data.reset_index(drop=True)
+    features = FeatureStore(data.index)
+    apply_embeddings(
+        data,
+        embed_fields,
+        embedding_max_length,
+        embedding_batch_size,
+        cache_dir=cache_dir,
+        features=features,
+        embedding_max_tokens=embedding_max_tokens,
+        embedding_precision=embedding_precision,
+        embedding_threads=embedding_threads,
+        embedding_pooling=embedding_pooling,
+        embedding_normalize=embedding_normalize,
     )
     print("Completed embedding step.")
 
-    data = apply_tfidf(data, tfidf_fields, max_features=tfidf_max_features)
+    apply_tfidf(data, tfidf_fields, max_features=tfidf_max_features, features=features)
     print("Completed TF-IDF step.")
 
-    embedding_columns = [col for col in data.columns if "embedding" in col]
-    if embedding_columns:
-        data = reduce_dimensions(data, embedding_columns, n_components=pca_components)
+    embedding_blocks = [f"{field}_embedding" for field in embed_fields]
+    if embedding_blocks:
+        reduce_dimensions(
+            features,
+            embedding_blocks,
+            n_components=pca_components,
+            method=pca_method,
+            projection=projection,
+        )
         print("Completed PCA step.")
-    return data
+    return data, features
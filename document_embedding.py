@@ -0,0 +1,56 @@
+# document_embedding.py
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+POOLING_MODES = ("mean", "max", "weighted")
+
+
+def split_token_windows(
+    text: str, tokenizer, window_size: int, overlap: int = 32
+) -> List[Tuple[str, int]]:
+    """
+    Split text into overlapping windows of at most `window_size` tokens.
+
+    Windows are sliced from the original string using the tokenizer's offset
+    mapping, so each chunk is re-tokenized to the same tokens by the model.
+    Returns (chunk_text, token_count) pairs; short texts give one window.
+    """
+    if window_size <= 0:
+        raise ValueError("window_size must be positive.")
+    overlap = min(max(0, overlap), window_size - 1)
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        truncation=False,
+        verbose=False,
+    )
+    offsets = encoding["offset_mapping"]
+    if len(offsets) <= window_size:
+        return [(text, len(offsets))]
+
+    windows = []
+    step = window_size - overlap
+    for start in range(0, len(offsets), step):
+        end = min(start + window_size, len(offsets))
+        windows.append((text[offsets[start][0] : offsets[end - 1][1]], end - start))
+        if end == len(offsets):
+            break
+    return windows
+
+
+def pool_embeddings(
+    embeddings: np.ndarray, token_counts: Sequence[int], mode: str = "mean"
+) -> np.ndarray:
+    """Pool chunk embeddings of shape (n_chunks, dim) into one vector."""
+    if mode == "mean":
+        return embeddings.mean(axis=0)
+    if mode == "max":
+        return embeddings.max(axis=0)
+    if mode == "weighted":
+        weights = np.asarray(token_counts, dtype=np.float32)
+        if weights.sum() <= 0:
+            return embeddings.mean(axis=0)
+        return (weights[:, None] * embeddings).sum(axis=0) / weights.sum()
+    raise ValueError(f"Unsupported pooling mode: {mode}. Use one of {POOLING_MODES}.")
@@ -0,0 +1,130 @@
+# embedding_backend.py
+import argparse
+import importlib
+import os
+import sys
+from typing import List
+
+import numpy as np
+
+BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+
+
+def require_onnx_runtime():
+    # Not in requirements.txt: only the onnx backends need these packages
+    try:
+        importlib.import_module("onnxruntime")
+        importlib.import_module("optimum.onnxruntime")
+    except ImportError as e:
+        raise ImportError(
+            "The onnx and onnx-int8 backends need Optimum and ONNX Runtime: "
+            'pip install "optimum[onnxruntime]"'
+        ) from e
+
+
+def load_model(
+    model_name: str,
+    backend: str = "torch",
+    export_dir: str = None,
+    quantization_config: str = "avx2",
+) -> "SentenceTransformer":
+    """
+    Load the embedding model with the selected CPU inference backend.
+
+    - torch: the FP32 PyTorch checkpoint as published.
+    - int8: the same checkpoint with Linear layers dynamically quantized.
+    - onnx: ONNX Runtime, exported on first load if the repo has no ONNX file.
+    - onnx-int8: ONNX Runtime with a dynamically quantized graph, exported once
+      to `export_dir` and reused afterwards.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported backend: {backend}. Use one of {BACKENDS}.")
+    if backend.startswith("onnx"):
+        require_onnx_runtime()
+
+    # Imported here so importing server.py does not pull in torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    if backend == "int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        transformer = model[0]
+        transformer.auto_model = torch.quantization.quantize_dynamic(
+            transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        return model
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = export_dir or os.path.join(
+        "models", model_name.replace("/", "__") + "-onnx"
+    )
+    file_suffix = f"qint8_{quantization_config}"
+    file_name = os.path.join("onnx", f"model_{file_suffix}.onnx")
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        onnx_model = SentenceTransformer(model_name, backend="onnx")
+        onnx_model.save_pretrained(export_dir)
+        export_dynamic_quantized_onnx_model(
+            onnx_model, quantization_config, export_dir, file_suffix=file_suffix
+        )
+    return SentenceTransformer(
+        export_dir, backend="onnx", model_kwargs={"file_name": file_name}
+    )
+
+
+def parity_report(
+    reference: "SentenceTransformer",
+    candidate: "SentenceTransformer",
+    texts: List[str],
+) -> dict:
+    """
+    Compare a candidate backend against the FP32 reference on the same texts.
+
+    Reports the per-text cosine between both embeddings and how often each
+    text's nearest neighbour among the other texts is unchanged.
+    """
+    ref = reference.encode(texts, normalize_embeddings=True)
+    cand = candidate.encode(texts, normalize_embeddings=True)
+    cosines = (ref * cand).sum(axis=1)
+    report = {
+        "texts": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+    }
+    if len(texts) > 1:
+        ref_sims, cand_sims = ref @ ref.T, cand @ cand.T
+        np.fill_diagonal(ref_sims, -np.inf)
+        np.fill_diagonal(cand_sims, -np.inf)
+        report["neighbour_agreement"] = float(
+            (ref_sims.argmax(axis=1) == cand_sims.argmax(axis=1)).mean()
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check a quantized/ONNX backend against the FP32 embeddings."
+    )
+    parser.add_argument("--model", default="CrazyDave53/OpenCV-finetuned")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx-int8")
+    parser.add_argument("--texts-file", required=True, help="One text per line.")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    with open(args.texts_file, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+
+    report = parity_report(
+        load_model(args.model, "torch"), load_model(args.model, args.backend), texts
+    )
+    print(report)
+    if report["min_cosine"] < args.min_cosine:
+        print(f"Parity check failed: min cosine below {args.min_cosine}")
+        sys.exit(1)
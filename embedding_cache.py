@@ -0,0 +1,305 @@
+# embedding_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from file_lock import LOCKS_AVAILABLE, lock_file, unlock_file
+
+
+def normalize_text(text: str) -> str:
+    # NFC keeps precomposed and combining Vietnamese diacritics on the same key
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only embedding store backed by memory-mapped float32 segments.
+
+    Rows live in fixed-size segment files (`vectors-00000.f32`, ...) that are
+    created as the store fills up, so disk use follows the row count rather
+    than `capacity`, and a mapped file never has to be resized. Rows are
+    written before their key is appended to `keys.txt`, so a crash never
+    leaves a key pointing at a partial row. Several processes (uvicorn or
+    pre-fork workers) can share one directory: writers take an exclusive lock
+    on `lock` and re-read `keys.txt` before reserving rows, and readers pick
+    up keys written by other processes on a miss.
+    """
+
+    def __init__(self, path: str, capacity: int = 200_000, segment_rows: int = 4096):
+        self.locked = LOCKS_AVAILABLE
+        self.path = path
+        self.capacity = capacity
+        self.segment_rows = segment_rows
+        self.dim: Optional[int] = None
+        self.rows: dict = {}
+        self.count = 0
+        self.keys_offset = 0
+        self.segments: List[np.memmap] = []
+        self.opened = False
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._refresh()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _exclusive(self):
+        with open(self._file("lock"), "a+b") as f:
+            lock_file(f)
+            try:
+                yield
+            finally:
+                unlock_file(f)
+
+    def _open_meta(self) -> bool:
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        self.dim, self.capacity = meta["dim"], meta["capacity"]
+        self.segment_rows = meta["segment_rows"]
+        self.opened = True
+        return True
+
+    def _segment(self, index: int, create: bool = False) -> np.memmap:
+        with self.lock:
+            while len(self.segments) <= index:
+                path = self._file(f"vectors-{len(self.segments):05d}.f32")
+                # Only writers create segments, under the file lock
+                mode = "w+" if create and not os.path.exists(path) else "r+"
+                self.segments.append(
+                    np.memmap(
+                        path,
+                        dtype=np.float32,
+                        mode=mode,
+                        shape=(self.segment_rows, self.dim),
+                    )
+                )
+            return self.segments[index]
+
+    def _refresh(self):
+        # Pick up rows appended by other processes since the last read
+        with self.lock:
+            if not self.opened and not self._open_meta():
+                return
+            keys_path = self._file("keys.txt")
+            if os.path.getsize(keys_path) <= self.keys_offset:
+                return
+            with open(keys_path, "rb") as f:
+                f.seek(self.keys_offset)
+                tail = f.read()
+            # A line without its newline is still being written
+            complete = tail[: tail.rfind(b"\n") + 1]
+            for line in complete.decode("utf-8").splitlines():
+                self.rows.setdefault(line, self.count)
+                self.count += 1
+            self.keys_offset += len(complete)
+
+    def _create(self, dim: int):
+        open(self._file("keys.txt"), "w").close()
+        # meta.json goes last: other processes only open a finished store
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "dim": dim,
+                    "capacity": self.capacity,
+                    "segment_rows": self.segment_rows,
+                },
+                f,
+            )
+        os.replace(tmp, self._file("meta.json"))
+        self.dim = dim
+        self.opened = True
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            self._refresh()
+            row = self.rows.get(key)
+        if row is None:
+            return None
+        segment = self._segment(row // self.segment_rows)
+        return np.array(segment[row % self.segment_rows])
+
+    def _write_rows(self, start: int, vectors: np.ndarray):
+        done = 0
+        while done < len(vectors):
+            index, offset = divmod(start + done, self.segment_rows)
+            segment = self._segment(index, create=True)
+            size = min(self.segment_rows - offset, len(vectors) - done)
+            segment[offset : offset + size] = vectors[done : done + size]
+            segment.flush()
+            done += size
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]) -> int:
+        """
+        Append a batch of (key, embedding) rows; returns how many were written.
+
+        Rows are reserved from the shared row count under the file lock, so
+        concurrent writers never hand out the same row twice.
+        """
+        with self._exclusive():
+            self._refresh()
+            if not self.opened:
+                self._create(items[0][1].shape[-1])
+
+            pending = {}
+            for key, embedding in items:
+                if key not in self.rows and embedding.shape[-1] == self.dim:
+                    pending.setdefault(key, embedding)
+            pending = list(pending.items())[: max(0, self.capacity - self.count)]
+            if not pending:
+                return 0
+
+            start = self.count
+            self._write_rows(start, np.stack([embedding for _, embedding in pending]))
+            with open(self._file("keys.txt"), "ab") as f:
+                f.write("".join(key + "\n" for key, _ in pending).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+                end = f.tell()
+            with self.lock:
+                for row, (key, _) in enumerate(pending, start):
+                    self.rows.setdefault(key, row)
+                self.count = start + len(pending)
+                self.keys_offset = end
+            return len(pending)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by model name and text hash.
+
+    Lookups try a bounded in-memory LRU first, then the optional on-disk
+    store; disk hits are promoted back into memory. New embeddings are queued
+    and written to disk in batches by `flush()`, which callers run off the
+    event loop once `should_flush()` says a batch is due. The queue is capped
+    at `max_pending` entries (oldest dropped first) and a batch whose write
+    fails is dropped, so a broken disk tier cannot grow memory without bound.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10_000,
+        disk_path: Optional[str] = None,
+        disk_capacity: int = 200_000,
+        flush_size: int = 64,
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.memory: OrderedDict = OrderedDict()
+        self.disk = DiskEmbeddingStore(disk_path, disk_capacity) if disk_path else None
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.pending: OrderedDict = OrderedDict()
+        self.pending_since = 0.0
+        self.max_pending = max(self.flush_size, max_pending)
+        self.flush_errors = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self.memory[key] = embedding
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        with self.lock:
+            embedding = self.memory.get(key)
+            if embedding is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return embedding
+            embedding = self.pending.get(key)
+            if embedding is not None:
+                self.memory_hits += 1
+                return embedding
+            if self.disk is not None:
+                embedding = self.disk.get(key)
+                if embedding is not None:
+                    self._remember(key, embedding)
+                    self.disk_hits += 1
+                    return embedding
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding: np.ndarray):
+        key = self.key(text)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self.lock:
+            if self.max_entries > 0:
+                self._remember(key, embedding)
+            if self.disk is not None and key not in self.disk.rows:
+                if not self.pending:
+                    self.pending_since = time.monotonic()
+                self.pending[key] = embedding
+                while len(self.pending) > self.max_pending:
+                    self.pending.popitem(last=False)
+
+    def should_flush(self) -> bool:
+        with self.lock:
+            return bool(self.pending) and (
+                len(self.pending) >= self.flush_size
+                or time.monotonic() - self.pending_since >= self.flush_interval
+            )
+
+    def flush(self) -> int:
+        """Write queued embeddings to the disk store; blocking, run in a thread."""
+        with self.flush_lock:
+            with self.lock:
+                items = list(self.pending.items())
+            if not items:
+                return 0
+            try:
+                return self.disk.put_many(items)
+            except Exception:
+                with self.lock:
+                    self.flush_errors += 1
+                raise
+            finally:
+                with self.lock:
+                    # Entries stay visible in `pending` until they are written;
+                    # a failed batch is dropped rather than retried forever
+                    for key, _ in items:
+                        self.pending.pop(key, None)
+                    self.pending_since = time.monotonic()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "model": self.model_name,
+                "memory_entries": len(self.memory),
+                "disk_entries": len(self.disk.rows) if self.disk else 0,
+                "disk_pending": len(self.pending),
+                "disk_flush_errors": self.flush_errors,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,50 @@
+# file_lock.py
+"""Advisory whole-file locks: fcntl.flock on Unix, msvcrt.locking on Windows."""
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# False only on platforms with neither API; callers fall back to one process
+LOCKS_AVAILABLE = fcntl is not None or msvcrt is not None
+
+
+def lock_file(f, blocking: bool = True) -> bool:
+    """Lock an open file exclusively; returns False if non-blocking and held."""
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(f.fileno(), flags)
+        except BlockingIOError:
+            return False
+        return True
+    if msvcrt is not None:
+        # msvcrt locks byte ranges; every holder locks the first byte
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                # LK_LOCK gives up after ten seconds; keep waiting instead
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    return True
+                except OSError:
+                    continue
+    return True
+
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,39 @@
+# memory_usage.py
+import os
+import sys
+
+
+def memory_report() -> dict:
+    """Resident memory of this process, split into shared and private pages."""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return peak_memory_report()
+
+    def mb(*names):
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+
+    return {
+        "pid": os.getpid(),
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+    }
+
+
+def peak_memory_report() -> dict:
+    # No smaps outside Linux; peak RSS is the best available figure on Unix
+    try:
+        import resource
+    except ImportError:
+        return {"pid": os.getpid()}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux and the BSDs
+    peak_kb = peak / 1024 if sys.platform == "darwin" else peak
+    return {"pid": os.getpid(), "max_rss_mb": round(peak_kb / 1024, 1)}
@@ -0,0 +1,108 @@
+# prefork.py
+"""
+Pre-fork launcher for server.py.
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker loads its own
+copy of the SentenceTransformer. This launcher loads the weights once in the
+parent, freezes the heap and forks the workers, which then share the weight
+pages copy-on-write and accept on one inherited socket.
+
+    python prefork.py --workers 4 --port 8000
+
+Only the PyTorch backends (torch, int8) can be loaded before fork: ONNX Runtime
+sessions start thread pools when they are built. VECTOR_STORE=local keeps its
+state in one process and is refused with more than one worker. EMBED_CACHE_DIR
+is shared through the disk cache's file lock.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+
+from memory_usage import memory_report
+
+
+def run_worker(app, sock: socket.socket):
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    threads = os.getenv("TORCH_THREADS_PER_WORKER")
+    if threads:
+        import torch
+
+        torch.set_num_threads(int(threads))
+    uvicorn.Server(uvicorn.Config(app, log_level="info")).run(sockets=[sock])
+
+
+# Backends whose weights can be loaded before fork()
+FORK_SAFE_BACKENDS = ("torch", "int8")
+
+
+def serve(host: str, port: int, workers: int):
+    # Workers size their per-process pools (e.g. CV extraction) from this
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    import server
+
+    if server.EMBED_BACKEND not in FORK_SAFE_BACKENDS:
+        raise SystemExit(
+            f"EMBED_BACKEND={server.EMBED_BACKEND} cannot be pre-forked; use one of "
+            f"{FORK_SAFE_BACKENDS} or run uvicorn --workers instead."
+        )
+    if server.VECTOR_STORE == "local" and workers > 1:
+        raise SystemExit(
+            "VECTOR_STORE=local holds its vectors in one process; "
+            "run a single worker or use Pinecone."
+        )
+    if server.cache.disk is not None and not server.cache.disk.locked:
+        raise SystemExit(
+            "EMBED_CACHE_DIR needs file locks to be shared between workers."
+        )
+
+    # Load weights only; running inference here would start thread pools
+    # that do not survive fork()
+    server.model.get()
+    gc.collect()
+    gc.freeze()
+    print(f"Parent loaded model: {memory_report()}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(server.app, sock)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    print(f"Started {workers} workers on {host}:{port}: {children}")
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
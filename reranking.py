@@ -0,0 +1,50 @@
+# reranking.py
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def stack_sections(
+    candidate_ids: Sequence[str],
+    sections: Dict[str, List[np.ndarray]],
+    dim: int,
+):
+    """
+    Pack per-candidate section vectors into a padded (n, s, dim) tensor plus
+    a boolean mask of the real entries, where s is the largest section count.
+    """
+    width = max([len(sections.get(cid, [])) for cid in candidate_ids] + [1])
+    packed = np.zeros((len(candidate_ids), width, dim), dtype=np.float32)
+    mask = np.zeros((len(candidate_ids), width), dtype=bool)
+    for i, cid in enumerate(candidate_ids):
+        vectors = sections.get(cid, [])
+        if vectors:
+            packed[i, : len(vectors)] = np.asarray(vectors, dtype=np.float32)
+            mask[i, : len(vectors)] = True
+    return packed, mask
+
+
+def maxsim_scores(
+    query_chunks: np.ndarray, doc_sections: np.ndarray, mask: np.ndarray
+) -> np.ndarray:
+    """
+    Late-interaction score of n candidates in one batched product.
+
+    Each of the m query chunks (m, dim) takes its best cosine match among a
+    candidate's sections (n, s, dim), and the per-chunk maxima are averaged.
+    Candidates without any section get NaN so callers can fall back to the
+    first-stage score.
+    """
+    queries = normalize_rows(np.asarray(query_chunks, dtype=np.float32))
+    n, s, dim = doc_sections.shape
+    docs = normalize_rows(doc_sections.reshape(n * s, dim))
+    sims = (queries @ docs.T).reshape(len(queries), n, s)
+    sims = np.where(mask[None, :, :], sims, -np.inf)
+    scores = sims.max(axis=2).mean(axis=0)
+    scores[~mask.any(axis=1)] = np.nan
+    return scores
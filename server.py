@@ -1,59 +1,594 @@
 # server.py
 from fastapi import FastAPI, Request, File, UploadFile, Form, HTTPException
-import pdfplumber
-import mammoth
-from sentence_transformers import SentenceTransformer
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from pinecone import Pinecone
+import asyncio
+import json
 import os
+import tempfile
+import threading
+import time
+import numpy as np
+
+from document_embedding import POOLING_MODES, pool_embeddings, split_token_windows
+from embedding_backend import load_model
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache
+from file_lock import lock_file
+from memory_usage import memory_report
+from reranking import maxsim_scores, stack_sections
+from text_extraction import DocumentTooLarge, TextExtractor
+from vector_store import LocalVectorStore, PineconeVectorStore
 
 load_dotenv(".env.local")
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(name=PINECONE_INDEX_NAME)
 
-app = FastAPI()
+
+class LazyResource:
+    """Thread-safe, build-once holder for the model and the index client."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.value = None
+        self.loaded = False
+
+    def get(self):
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    self.value = self.factory()
+                    self.loaded = True
+        return self.value
+
+
+# VECTOR_STORE=local keeps job vectors in-process instead of calling Pinecone.
+# It only works with a single worker: each worker would hold its own copy.
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_lock = None
+
+
+def claim_single_worker():
+    # `uvicorn --workers` does not set WEB_CONCURRENCY; its workers share a
+    # parent process, so the first one to lock this file keeps the store
+    global worker_lock
+    path = os.path.join(
+        tempfile.gettempdir(), f"opencv-local-store-{os.getppid()}.lock"
+    )
+    lock = open(path, "a+b")
+    if not lock_file(lock, blocking=False):
+        lock.close()
+        raise RuntimeError(
+            "VECTOR_STORE=local supports a single worker only, and another "
+            "worker of this server already holds the store."
+        )
+    worker_lock = lock
+
+
+def create_store():
+    if VECTOR_STORE == "local":
+        if WORKERS > 1:
+            raise RuntimeError(
+                "VECTOR_STORE=local supports a single worker only "
+                f"(WEB_CONCURRENCY={WORKERS})."
+            )
+        # With LOCAL_INDEX_DIR set, the store locks its own directory instead
+        if not os.getenv("LOCAL_INDEX_DIR"):
+            claim_single_worker()
+        return LocalVectorStore(
+            path=os.getenv("LOCAL_INDEX_DIR") or None,
+            ann_min_size=int(os.getenv("LOCAL_ANN_MIN_SIZE", "50000")) or None,
+        )
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    return PineconeVectorStore(pc.Index(name=PINECONE_INDEX_NAME))
+
+
+store = LazyResource(create_store)
+
+
+async def call_store(method: str, *args):
+    # The first call builds the client inside the worker thread, not the loop
+    return await asyncio.to_thread(lambda: getattr(store.get(), method)(*args))
+
 
 # Load the pipeline
-model = SentenceTransformer("CrazyDave53/OpenCV-finetuned")
-
-
-def extract_text_from_file(file: UploadFile) -> str:
-    if file.filename.endswith(".pdf"):
-        # Open the PDF file using pdfplumber
-        with pdfplumber.open(file.file) as pdf:
-            # Extract the text from each page of the PDF
-            text = "".join([page.extract_text() for page in pdf.pages])
-    elif file.filename.endswith(".docx"):
-        # Extract the text from the DOCX file using mammoth
-        result = mammoth.extract_raw_text(file)
-        text = result.value
+MODEL_NAME = "CrazyDave53/OpenCV-finetuned"
+# EMBED_BACKEND picks torch (FP32), int8, onnx or onnx-int8 CPU inference
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+model = LazyResource(
+    lambda: load_model(
+        MODEL_NAME,
+        EMBED_BACKEND,
+        export_dir=os.getenv("ONNX_EXPORT_DIR") or None,
+        quantization_config=os.getenv("ONNX_QUANTIZATION_CONFIG", "avx2"),
+    )
+)
+
+# Readiness: the model counts as warm after its first successful encode, be it
+# the startup warm-up or the first request when EAGER_LOAD=0
+model_state = {"warm": False, "error": None}
+
+
+def encode_texts(texts: list):
+    embeddings = model.get().encode(texts)
+    if not model_state["warm"]:
+        model_state.update(warm=True, error=None)
+    return embeddings
+
+
+# Concurrent requests share one encode call instead of blocking the event loop
+batcher = EmbeddingBatcher(
+    encode_texts,
+    max_batch_size=int(os.getenv("EMBED_MAX_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("EMBED_MAX_WAIT_MS", "5")),
+)
+
+# Bulk endpoints encode in slices so interactive requests can interleave
+BULK_ENCODE_BATCH_SIZE = int(os.getenv("BULK_ENCODE_BATCH_SIZE", "256"))
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "100"))
+UPSERT_CHUNK_MAX_BYTES = int(os.getenv("UPSERT_CHUNK_MAX_BYTES", str(2 * 1024 * 1024)))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+
+
+# Repeated texts (popular queries, re-uploaded CVs) skip the transformer
+cache = EmbeddingCache(
+    f"{MODEL_NAME}:{EMBED_BACKEND}",
+    max_entries=int(os.getenv("EMBED_CACHE_SIZE", "10000")),
+    disk_path=os.getenv("EMBED_CACHE_DIR") or None,
+    disk_capacity=int(os.getenv("EMBED_CACHE_DISK_CAPACITY", "200000")),
+    flush_size=int(os.getenv("EMBED_CACHE_FLUSH_SIZE", "64")),
+    max_pending=int(os.getenv("EMBED_CACHE_MAX_PENDING", "10000")),
+)
+cache_flush = None
+
+
+def schedule_cache_flush():
+    # Disk writes run in a worker thread, one batch at a time
+    global cache_flush
+    if cache.should_flush() and (cache_flush is None or cache_flush.done()):
+        cache_flush = asyncio.create_task(asyncio.to_thread(cache.flush))
+        cache_flush.add_done_callback(log_cache_flush)
+
+
+def log_cache_flush(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Embedding cache flush failed: {str(task.exception())}")
+
+
+async def embed_text(text: str):
+    embedding = cache.get(text)
+    if embedding is None:
+        embedding = await batcher.encode(text)
+        cache.put(text, embedding)
+        schedule_cache_flush()
+    return embedding
+
+
+async def encode_bulk(texts: list) -> list:
+    loop = asyncio.get_running_loop()
+    embeddings = [cache.get(text) for text in texts]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    for start in range(0, len(missing), BULK_ENCODE_BATCH_SIZE):
+        positions = missing[start : start + BULK_ENCODE_BATCH_SIZE]
+        batch = [texts[i] for i in positions]
+        encoded = await loop.run_in_executor(batcher.executor, batcher.encode_fn, batch)
+        for i, text, embedding in zip(positions, batch, encoded):
+            cache.put(text, embedding)
+            embeddings[i] = embedding
+        schedule_cache_flush()
+    return embeddings
+
+
+# Chunked mode embeds every token window of a long document, not just the
+# first max_seq_length tokens, and pools the window vectors
+CHUNKED_EMBEDDING = os.getenv("CHUNKED_EMBEDDING", "0") == "1"
+CHUNK_POOLING = os.getenv("CHUNK_POOLING", "mean")
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "32"))
+
+
+async def embed_document(text: str, pooling: str = CHUNK_POOLING):
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"pooling must be one of {POOLING_MODES}.")
+    # Leave room for the special tokens the model adds to every window
+    windows = await asyncio.to_thread(
+        lambda: split_token_windows(
+            text,
+            model.get().tokenizer,
+            model.get().max_seq_length - 2,
+            CHUNK_OVERLAP,
+        )
+    )
+    chunk_embeddings = np.stack(await encode_bulk([chunk for chunk, _ in windows]))
+    pooled = pool_embeddings(chunk_embeddings, [count for _, count in windows], pooling)
+    return pooled, chunk_embeddings
+
+
+def count_tokens(text: str) -> int:
+    encoding = model.get().tokenizer(
+        text, add_special_tokens=False, truncation=False, verbose=False
+    )
+    return len(encoding["input_ids"])
+
+
+async def embed_segment(text: str):
+    windows = await asyncio.to_thread(
+        lambda: split_token_windows(
+            text,
+            model.get().tokenizer,
+            model.get().max_seq_length - 2,
+            CHUNK_OVERLAP,
+        )
+    )
+    embeddings = await encode_bulk([chunk for chunk, _ in windows])
+    return embeddings, [count for _, count in windows]
+
+
+async def embed_pages(pages, chunking: bool = False, pooling: str = CHUNK_POOLING):
+    """
+    Embed a document while its later pages are still being extracted.
+
+    Without chunking only the first max_seq_length tokens reach the model, so
+    encoding starts as soon as the pages read so far exceed that length. With
+    chunking, pages are grouped into segments of at least one window and each
+    segment is windowed and encoded as soon as it is complete; windows do not
+    span segment boundaries.
+
+    Returns (text, embedding, chunk_embeddings or None).
+    """
+    if chunking and pooling not in POOLING_MODES:
+        raise ValueError(f"pooling must be one of {POOLING_MODES}.")
+    limit = (await asyncio.to_thread(model.get)).max_seq_length - 2
+    texts, segment, segment_tokens, tasks = [], [], 0, []
+    try:
+        async for page in pages:
+            texts.append(page)
+            if not chunking and tasks:
+                continue
+            segment.append(page)
+            segment_tokens += await asyncio.to_thread(count_tokens, page)
+            if segment_tokens <= limit:
+                continue
+            if chunking:
+                tasks.append(asyncio.create_task(embed_segment("\n".join(segment))))
+                segment, segment_tokens = [], 0
+            else:
+                tasks.append(asyncio.create_task(embed_text("\n".join(texts))))
+        text = "\n".join(texts)
+
+        if not chunking:
+            embedding = await (tasks[0] if tasks else embed_text(text))
+            return text, embedding, None
+
+        if segment or not tasks:
+            tasks.append(asyncio.create_task(embed_segment("\n".join(segment))))
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await pages.aclose()
+        raise
+
+    chunk_embeddings = np.concatenate([np.stack(e) for e, _ in results])
+    counts = [count for _, segment_counts in results for count in segment_counts]
+    return text, pool_embeddings(chunk_embeddings, counts, pooling), chunk_embeddings
+
+
+def chunk_vectors(vectors: list) -> list:
+    # Keep every upsert request under Pinecone's count and payload limits
+    chunks, start, current_bytes = [], 0, 0
+    for end, vector in enumerate(vectors):
+        size = len(json.dumps(vector["metadata"])) + 12 * len(vector["values"])
+        if end > start and (
+            end - start >= UPSERT_CHUNK_SIZE
+            or current_bytes + size > UPSERT_CHUNK_MAX_BYTES
+        ):
+            chunks.append(vectors[start:end])
+            start, current_bytes = end, 0
+        current_bytes += size
+    if start < len(vectors):
+        chunks.append(vectors[start:])
+    return chunks
+
+
+async def upsert_chunks(chunks: list, namespace: str) -> list:
+    semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+
+    async def upsert_chunk(chunk):
+        async with semaphore:
+            try:
+                await call_store("upsert", chunk, namespace)
+                return None
+            except Exception as e:
+                return str(e)
+
+    return await asyncio.gather(*(upsert_chunk(chunk) for chunk in chunks))
+
+
+async def upsert_records(records: list, namespace: str) -> list:
+    # Encode {"id", "text", "metadata"} records and return one error per record
+    embeddings = await encode_bulk([record["text"] for record in records])
+    vectors = [
+        {
+            "id": record["id"],
+            "values": embedding.tolist(),
+            "metadata": record["metadata"],
+        }
+        for record, embedding in zip(records, embeddings)
+    ]
+    chunks = chunk_vectors(vectors)
+    errors = await upsert_chunks(chunks, namespace)
+    return [error for chunk, error in zip(chunks, errors) for _ in chunk]
+
+
+# Two-stage recommendations re-rank over-fetched candidates by max-sim between
+# CV chunk vectors ("cv-chunks") and job section vectors ("job-sections")
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "5"))
+MAX_CV_CHUNKS = int(os.getenv("MAX_CV_CHUNKS", "32"))
+JOB_SECTIONS = ("jd", "context", "skills")
+
+
+def section_records(job_id: str, sections) -> list:
+    records = []
+    if not isinstance(sections, dict):
+        return records
+    for name in JOB_SECTIONS:
+        text = sections.get(name)
+        if isinstance(text, list):
+            text = ", ".join(str(item) for item in text)
+        if text:
+            records.append(
+                {
+                    "id": f"{job_id}#{name}",
+                    "text": text,
+                    "metadata": {"job_id": job_id, "section": name},
+                }
+            )
+    return records
+
+
+async def store_cv_chunks(cv_id: str, chunk_embeddings: np.ndarray):
+    vectors = [
+        {
+            "id": f"{cv_id}#chunk-{i}",
+            "values": embedding.tolist(),
+            "metadata": {"cv_id": cv_id, "chunk": i},
+        }
+        for i, embedding in enumerate(chunk_embeddings[:MAX_CV_CHUNKS])
+    ]
+    await call_store("upsert", vectors, "cv-chunks")
+    # Drop chunks left over from a longer previous version of the CV
+    stale = [f"{cv_id}#chunk-{i}" for i in range(len(vectors), MAX_CV_CHUNKS)]
+    if stale:
+        await call_store("delete", stale, "cv-chunks")
+
+
+async def rerank_matches(cv_id: str, cv_embedding, matches: list, top_k: int):
+    chunk_ids = [f"{cv_id}#chunk-{i}" for i in range(MAX_CV_CHUNKS)]
+    section_ids = [
+        f"{match['id']}#{name}" for match in matches for name in JOB_SECTIONS
+    ]
+    cv_chunks, sections = await asyncio.gather(
+        call_store("fetch", chunk_ids, "cv-chunks"),
+        call_store("fetch", section_ids, "job-sections"),
+    )
+
+    # CVs uploaded without chunking fall back to their single vector
+    query_chunks = np.asarray(
+        [cv_chunks[i]["values"] for i in chunk_ids if i in cv_chunks] or [cv_embedding],
+        dtype=np.float32,
+    )
+    by_job = {}
+    for section_id in section_ids:
+        if section_id in sections:
+            job_id = section_id.rsplit("#", 1)[0]
+            by_job.setdefault(job_id, []).append(sections[section_id]["values"])
+
+    # Jobs upserted without sections are scored against their whole-document
+    # vector, so every candidate is ranked on the same max-sim scale
+    missing = [match["id"] for match in matches if match["id"] not in by_job]
+    if missing:
+        documents = await call_store("fetch", missing, "jobs")
+        for job_id, vector in documents.items():
+            by_job[job_id] = [vector["values"]]
+
+    packed, mask = stack_sections(
+        [match["id"] for match in matches], by_job, query_chunks.shape[1]
+    )
+    scores = maxsim_scores(query_chunks, packed, mask)
+
+    reranked = [
+        {"id": match["id"], "score": float(score), "retrieval_score": match["score"]}
+        for match, score in zip(matches, scores)
+        if not np.isnan(score)
+    ]
+    reranked.sort(key=lambda match: match["score"], reverse=True)
+    # Candidates with no vector at all keep their first-stage order at the end
+    reranked += [
+        {"id": match["id"], "score": match["score"], "retrieval_score": match["score"]}
+        for match, score in zip(matches, scores)
+        if np.isnan(score)
+    ]
+    return reranked[:top_k]
+
+
+# CV parsing runs in worker processes, split by page ranges; every server
+# worker has its own pool, so the default splits the CPUs between workers
+extractor = TextExtractor(
+    max_workers=int(os.getenv("EXTRACT_WORKERS", "0"))
+    or max(1, (os.cpu_count() or 1) // WORKERS),
+    max_pages=int(os.getenv("EXTRACT_MAX_PAGES", "50")),
+    max_bytes=int(os.getenv("EXTRACT_MAX_BYTES", str(10 * 1024 * 1024))),
+    pages_per_task=int(os.getenv("EXTRACT_PAGES_PER_TASK", "4")),
+)
+
+
+# The store is reported on its own: an index outage is not a model failure
+store_state = {"error": None}
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+warmup = {"task": None, "started": 0.0}
+
+
+async def warm_up():
+    if not store.loaded:
+        try:
+            await asyncio.to_thread(store.get)
+            store_state["error"] = None
+        except Exception as e:
+            store_state["error"] = str(e)
+            print(f"Vector store failed to load: {str(e)}")
+    if not model_state["warm"]:
+        try:
+            await asyncio.to_thread(model.get)
+            await batcher.encode("warm up")
+            print(f"Model loaded and warmed up: {memory_report()}")
+        except Exception as e:
+            model_state["error"] = str(e)
+            print(f"Warm-up failed: {str(e)}")
+
+
+def start_warm_up():
+    task = warmup["task"]
+    if task is not None and not task.done():
+        return
+    if task is not None and time.monotonic() - warmup["started"] < WARMUP_RETRY_SECONDS:
+        return
+    warmup.update(task=asyncio.create_task(warm_up()), started=time.monotonic())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Loading runs in the background so /healthz answers immediately;
+    # set EAGER_LOAD=0 to defer loading to the first request instead
+    if os.getenv("EAGER_LOAD", "1") == "1":
+        start_warm_up()
+    yield
+    if warmup["task"] is not None:
+        warmup["task"].cancel()
+    # Each step runs even if an earlier one fails, so the local index is saved
+    try:
+        await batcher.close()
+    except Exception as e:
+        print(f"Closing the embedding batcher failed: {str(e)}")
+    if cache.disk is not None:
+        try:
+            if cache_flush is not None:
+                await asyncio.gather(cache_flush, return_exceptions=True)
+            await asyncio.to_thread(cache.flush)
+        except Exception as e:
+            print(f"Final embedding cache flush failed: {str(e)}")
+    try:
+        extractor.shutdown()
+    except Exception as e:
+        print(f"Stopping the extraction pool failed: {str(e)}")
+    if store.loaded and isinstance(store.value, LocalVectorStore) and store.value.path:
+        try:
+            store.value.save()
+        except Exception as e:
+            print(f"Saving the local vector store failed: {str(e)}")
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    # A failed warm-up (model or store) is retried, at most once per
+    # WARMUP_RETRY_SECONDS
+    store_error = None if store.loaded else store_state["error"]
+    if model_state["error"] or store_error:
+        start_warm_up()
+    body = {
+        "model": {
+            "loaded": model.loaded,
+            "warmed_up": model_state["warm"],
+            "error": model_state["error"],
+        },
+        "store": {
+            "backend": VECTOR_STORE,
+            "loaded": store.loaded,
+            "error": store_error,
+        },
+        "backend": EMBED_BACKEND,
+        "memory": memory_report(),
+    }
+    if model.loaded and model_state["warm"]:
+        return {"status": "ready", **body}
+    if model_state["error"]:
+        status = "error"
+    elif warmup["task"] is None and not model.loaded:
+        status = "idle"
     else:
-        # Raise an error if the file type is not supported
-        raise ValueError("Unsupported file type")
-    return text
+        status = "loading"
+    return JSONResponse(status_code=503, content={"status": status, **body})
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return cache.stats()
 
 
 @app.post("/embed")
 async def embed(request: Request):
     data = await request.json()
     text = data["text"]
-    embedding = model.encode(text).tolist()  # Generate embedding
+    embedding = (await embed_text(text)).tolist()  # Generate embedding
     return {"embedding": embedding}
 
 
+@app.post("/embed-batch")
+async def embed_batch(request: Request):
+    data = await request.json()
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise HTTPException(status_code=400, detail="texts must be a list of strings.")
+
+    embeddings = await encode_bulk(texts)
+    return {"embeddings": [embedding.tolist() for embedding in embeddings]}
+
+
 @app.post("/process-cv")
-async def process_cv(file: UploadFile = File(...)) -> dict:
-    # Extract the text from the CV file
-    extracted_text = extract_text_from_file(file)
+async def process_cv(
+    file: UploadFile = File(...),
+    chunking: bool = Form(CHUNKED_EMBEDDING),
+    pooling: str = Form(CHUNK_POOLING),
+    return_chunks: bool = Form(False),
+    cv_id: str = Form(None),
+) -> dict:
+    # Pages are embedded while the remaining pages are still being extracted
+    data = await file.read(extractor.max_bytes + 1)
+    try:
+        extracted_text, embedding, chunk_embeddings = await embed_pages(
+            extractor.stream_pages(data, file.filename), chunking, pooling
+        )
+    except DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Generate an embedding for the extracted text
-    embedding = model.encode(extracted_text).tolist()
+    if not chunking:
+        return {"extractedText": extracted_text, "embedding": embedding.tolist()}
+
+    # Keep the chunk vectors for late-interaction re-ranking
+    if cv_id:
+        await store_cv_chunks(cv_id, chunk_embeddings)
 
     # Return the extracted text and its corresponding embedding
-    return {"extractedText": extracted_text, "embedding": embedding}
+    response = {"extractedText": extracted_text, "embedding": embedding.tolist()}
+    if return_chunks:
+        response["chunkEmbeddings"] = chunk_embeddings.tolist()
+    return response
 
 
 @app.post("/search-jobs")
@@ -64,14 +599,14 @@ async def search_jobs(request: Request):
     top_k = data.get("top_k", 10)
 
     # Generate embedding for the query
-    query_embedding = model.encode(query_text).tolist()
+    query_embedding = (await embed_text(query_text)).tolist()
 
-    # Perform similarity search in Pinecone
-    results = index.query(
-        vector=query_embedding, top_k=top_k, include_metadata=True, namespace="jobs"
+    # Perform similarity search in the vector store
+    matches = await call_store(
+        "query", query_embedding, top_k, "jobs", data.get("filter")
     )
 
-    return {"results": results}
+    return {"results": {"matches": matches, "namespace": "jobs"}}
 
 
 @app.post("/upsert-job")
@@ -88,25 +623,131 @@ async def upsert_job(request: Request):
             )
 
         # Generate embedding for the job
-        embedding = model.encode(combined_text).tolist()
-
-        # Upsert the embedding into Pinecone
-        index.upsert(
-            vectors=[
+        chunk_embeddings = None
+        if data.get("chunking", CHUNKED_EMBEDDING):
+            try:
+                embedding, chunk_embeddings = await embed_document(
+                    combined_text, data.get("pooling", CHUNK_POOLING)
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            embedding = embedding.tolist()
+        else:
+            embedding = (await embed_text(combined_text)).tolist()
+
+        # Upsert the embedding into the vector store
+        await call_store(
+            "upsert",
+            [
                 {
                     "id": job_id,
                     "values": embedding,
                     "metadata": metadata,
                 }
             ],
-            namespace="jobs",
+            "jobs",
         )
 
-        return {"message": "Job data upserted successfully.", "job_id": job_id}
+        # Section vectors feed the re-ranking stage of /recommend-jobs
+        records = section_records(job_id, data.get("sections"))
+        if records:
+            errors = await upsert_records(records, "job-sections")
+            if any(errors):
+                raise RuntimeError(next(error for error in errors if error))
+
+        response = {"message": "Job data upserted successfully.", "job_id": job_id}
+        if chunk_embeddings is not None and data.get("return_chunks"):
+            response["chunk_embeddings"] = chunk_embeddings.tolist()
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error upserting job: {str(e)}")
 
 
+@app.post("/upsert-jobs")
+async def upsert_jobs(request: Request):
+    data = await request.json()
+    jobs = data.get("jobs")
+    if not isinstance(jobs, list):
+        raise HTTPException(status_code=400, detail="jobs must be a list.")
+
+    # Validate each record; invalid ones are reported without failing the batch
+    results = []
+    valid = []
+    for position, job in enumerate(jobs):
+        job_id = job.get("job_id") if isinstance(job, dict) else None
+        combined_text = job.get("combined_text") if isinstance(job, dict) else None
+        if not job_id or not combined_text:
+            results.append(
+                {
+                    "job_id": job_id,
+                    "status": "failed",
+                    "error": "job_id and combined_text are required.",
+                }
+            )
+            continue
+        results.append({"job_id": job_id, "status": "pending"})
+        valid.append((position, job))
+
+    records = [
+        {
+            "id": job["job_id"],
+            "text": job["combined_text"],
+            "metadata": job.get("metadata", {}),
+        }
+        for _, job in valid
+    ]
+    sections = [
+        (position, record)
+        for position, job in valid
+        for record in section_records(job["job_id"], job.get("sections"))
+    ]
+    try:
+        errors = await upsert_records(records, "jobs")
+        section_errors = await upsert_records(
+            [record for _, record in sections], "job-sections"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error encoding jobs: {str(e)}")
+
+    for (position, _), error in zip(valid, errors):
+        if error is None:
+            results[position]["status"] = "upserted"
+        else:
+            results[position].update(
+                status="failed", error=f"Error upserting job: {error}"
+            )
+    for (position, _), error in zip(sections, section_errors):
+        if error is not None:
+            results[position]["warning"] = f"Error upserting sections: {error}"
+
+    upserted = sum(result["status"] == "upserted" for result in results)
+    return {"upserted": upserted, "failed": len(results) - upserted, "results": results}
+
+
+@app.post("/upsert-cv")
+async def upsert_cv(request: Request):
+    # CV vectors go through the server so /recommend-jobs can fetch them from
+    # whichever vector store is configured
+    data = await request.json()
+    cv_id = data.get("cvId")
+    embedding = data.get("embedding")
+    if not cv_id or not isinstance(embedding, list) or not embedding:
+        raise HTTPException(status_code=400, detail="cvId and embedding are required.")
+
+    try:
+        await call_store(
+            "upsert",
+            [{"id": cv_id, "values": embedding, "metadata": data.get("metadata", {})}],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error upserting CV: {str(e)}")
+    return {"message": "CV upserted successfully.", "cvId": cv_id}
+
+
 @app.post("/recommend-jobs")
 async def recommend_jobs(request: Request):
     try:
@@ -119,41 +760,48 @@ async def recommend_jobs(request: Request):
         if not cv_id:
             raise HTTPException(status_code=400, detail="cvId is required.")
 
-        # Fetch CV embedding from Pinecone
+        # Fetch CV embedding from the vector store
         print(f"Fetching CV embedding for {cv_id}...")
-        fetch_result = index.fetch(ids=[cv_id])
+        fetch_result = await call_store("fetch", [cv_id])
 
         # Debug fetch result
         # print(f"Fetch result: {fetch_result}")
 
         # Validate embedding exists in fetch_result
-        embedding_data = fetch_result.get("vectors", {}).get(cv_id)
+        embedding_data = fetch_result.get(cv_id)
         if not embedding_data or "values" not in embedding_data:
-            raise HTTPException(
-                status_code=404, detail=f"Embedding not found for cvId: {cv_id}"
-            )
+            detail = f"Embedding not found for cvId: {cv_id}"
+            if VECTOR_STORE == "local":
+                detail += " (the local vector store only holds CVs sent to /upsert-cv)"
+            raise HTTPException(status_code=404, detail=detail)
 
         cv_embedding = embedding_data["values"]
 
-        # Perform similarity search in Pinecone
-        print("Querying Pinecone for similar jobs...")
-        query_results = index.query(
-            vector=cv_embedding,
-            top_k=top_k,
-            include_metadata=True,
-            namespace="jobs",
+        # Perform similarity search in the vector store, over-fetching when
+        # the candidates are re-ranked afterwards
+        rerank = data.get("rerank", RERANK)
+        fetch_k = top_k * RERANK_OVERFETCH if rerank else top_k
+        print("Querying vector store for similar jobs...")
+        query_results = await call_store(
+            "query", cv_embedding, fetch_k, "jobs", data.get("filter"), False
         )
+        if rerank and query_results:
+            query_results = await rerank_matches(
+                cv_id, cv_embedding, query_results, top_k
+            )
 
         # Check if there are matches
-        if not query_results.matches:
+        if not query_results:
             return {"matches": []}
 
         # Format matches for response
         matches = [
-            {"id": match.id, "score": match.score} for match in query_results.matches
+            {"id": match["id"], "score": match["score"]} for match in query_results
         ]
         return {"matches": matches}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in recommend_jobs: {str(e)}")
         raise HTTPException(
@@ -5,19 +5,26 @@ import fs from "fs";
 
 /**
  * Sends the file to FastAPI for text extraction and embedding generation.
+ * The CV is embedded in chunks: the returned embedding is pooled over the
+ * whole document, and the chunk vectors are stored under `cvId` so that
+ * /recommend-jobs can re-rank candidates against job sections.
  *
  * @param {string} filePath Path to the uploaded CV file.
  * @param {string} mimetype File mimetype (e.g., application/pdf).
+ * @param {string} cvId CV document id, used as the key of the chunk vectors.
  * @returns {Promise<{ extractedText: string; embedding: number[] }>} Extracted text and embedding from the server.
  */
 export async function processCV(
   filePath: string,
-  mimetype: string
+  mimetype: string,
+  cvId: string
 ): Promise<{ extractedText: string; embedding: number[] }> {
   try {
     const formData = new FormData();
     formData.append("file", fs.createReadStream(filePath));
     formData.append("mimetype", mimetype);
+    formData.append("cv_id", cvId);
+    formData.append("chunking", "true");
 
     const response = await axios.post(
       "http://localhost:8000/process-cv",
@@ -35,3 +42,28 @@ export async function processCV(
     throw new Error("Failed to process CV.");
   }
 }
+
+/**
+ * Stores the CV embedding through FastAPI so that /recommend-jobs reads it
+ * from the same vector store (Pinecone or the local backend).
+ *
+ * @param {string} cvId CV document id.
+ * @param {number[]} embedding CV embedding returned by processCV.
+ * @param {Record<string, unknown>} metadata Metadata stored with the vector.
+ */
+export async function upsertCV(
+  cvId: string,
+  embedding: number[],
+  metadata: Record<string, unknown>
+): Promise<void> {
+  try {
+    await axios.post(`${process.env.FASTAPI_URL}/upsert-cv`, {
+      cvId,
+      embedding,
+      metadata,
+    });
+  } catch (error) {
+    console.error("Error in upsertCV:", error);
+    throw new Error("Failed to store CV embedding.");
+  }
+}
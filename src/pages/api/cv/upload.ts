@@ -6,8 +6,7 @@ import path from "path";
 import fs from "fs";
 import connectToDatabase from "../../../lib/db/mongodb";
 import { CVModel } from "../../../lib/models/CV";
-import { processCV } from "@/lib/services/cvProcessor";
-import { pineconeIndex } from "../../../lib/db/pinecone";
+import { processCV, upsertCV } from "@/lib/services/cvProcessor";
 import { runMiddleware } from "@/middleware/runMiddleware";
 
 interface NextAPIUploadCVRequest extends NextApiRequest {
@@ -76,23 +75,21 @@ const handler = async (req: NextApiRequest, res: NextApiResponse) => {
 
     console.log("Processing CV with FastAPI...");
 
-    const { extractedText, embedding } = await processCV(filePath, mimetype);
+    const { extractedText, embedding } = await processCV(
+      filePath,
+      mimetype,
+      cv._id.toString()
+    );
     cv.parsedContent = extractedText;
     // Uncomment the following line to save the CV to MongoDB
     await cv.save();
 
-    console.log("Saving embedding to Pinecone...");
-
-    await pineconeIndex.upsert([
-      {
-        id: cv._id.toString(),
-        values: embedding,
-        metadata: {
-          userId: reqWithFile.user.id,
-          uploadedAt: cv.uploadedAt.toISOString(),
-        },
-      },
-    ]);
+    console.log("Saving embedding to the vector store...");
+
+    await upsertCV(cv._id.toString(), embedding, {
+      userId: reqWithFile.user.id,
+      uploadedAt: cv.uploadedAt.toISOString(),
+    });
 
     console.log("Cleaning up file...");
     // Remove the uploaded file from the server
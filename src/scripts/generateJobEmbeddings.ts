@@ -2,10 +2,17 @@
 import connectToDatabase from "../lib/db/mongodb";
 import { JobModel } from "../lib/models/Job";
 import axios from "axios";
-import { pineconeIndex } from "../lib/db/pinecone";
+
+const FASTAPI_URL = process.env.FASTAPI_URL; // Ensure this variable is set in .env
+const UPSERT_BATCH_SIZE = 1000; // Jobs sent per /upsert-jobs request
+
+if (!FASTAPI_URL) {
+  throw new Error("FASTAPI_URL is not defined in environment variables.");
+}
 
 /**
- * Generates embeddings for all jobs in the database and saves them to Pinecone.
+ * Re-generates embeddings for all jobs in the database. FastAPI embeds each
+ * batch and upserts it into the vector store (Pinecone or the local backend).
  */
 async function generateJobEmbeddings() {
   // Connect to the database
@@ -14,34 +21,40 @@ async function generateJobEmbeddings() {
   // Get all jobs from the database
   const jobs = await JobModel.find({});
 
-  // Process each job and generate an embedding
-  for (const job of jobs) {
+  for (let i = 0; i < jobs.length; i += UPSERT_BATCH_SIZE) {
+    const batch = jobs.slice(i, i + UPSERT_BATCH_SIZE);
     try {
-      // Call FastAPI to generate an embedding for the job description
-      const response = await axios.post("http://localhost:8000/embed-text", {
-        text: job.jobDescription,
-      });
-
-      const embedding = response.data.embedding;
-
-      // Upsert the embedding to Pinecone
-      await pineconeIndex.upsert([
-        {
-          id: job._id.toString(),
-          values: embedding,
+      const response = await axios.post(`${FASTAPI_URL}/upsert-jobs`, {
+        jobs: batch.map((job) => ({
+          job_id: job._id.toString(),
+          combined_text: job.jobDescription,
           metadata: {
             title: job.title,
             industry: job.industry,
             location: job.location,
           },
-        },
-      ]);
+          // Section vectors let /recommend-jobs re-rank by max-sim
+          sections: {
+            jd: job.jobDescription,
+            context: job.requirementContext,
+            skills: job.skillsRequired,
+          },
+        })),
+      });
 
-      // Print a success message
-      console.log(`Embedding generated for job ${job.title}`);
+      const { upserted, failed, results } = response.data;
+      console.log(`Upserted ${upserted} jobs, ${failed} failed.`);
+      for (const result of results) {
+        if (result.status === "failed") {
+          console.error(`Failed to upsert job ${result.job_id}:`, result.error);
+        }
+      }
     } catch (error) {
-      // Print an error message if something goes wrong
-      console.error(`Error generating embedding for job ${job.title}:`, error);
+      // Print an error message if the whole batch failed
+      console.error(
+        `Error generating embeddings for ${batch.length} jobs:`,
+        error.response?.data || error.message
+      );
     }
   }
 
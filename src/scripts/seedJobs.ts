@@ -5,6 +5,7 @@ import fs from "fs";
 import axios from "axios";
 
 const FASTAPI_URL = process.env.FASTAPI_URL; // Ensure this variable is set in .env
+const UPSERT_BATCH_SIZE = 1000; // Jobs sent per /upsert-jobs request
 
 if (!FASTAPI_URL) {
   throw new Error("FASTAPI_URL is not defined in environment variables.");
@@ -17,12 +18,8 @@ export async function seedJobs() {
     fs.readFileSync("./AI/data_processing/job/jobs.json", "utf8")
   );
 
-  for (const job of jobs) {
-    if (typeof job.skillsRequired === "string") {
-      job.skillsRequired = JSON.parse(job.skillsRequired.replace(/'/g, '"'));
-    }
-
-    await saveJob(job);
+  for (let i = 0; i < jobs.length; i += UPSERT_BATCH_SIZE) {
+    await saveJobs(jobs.slice(i, i + UPSERT_BATCH_SIZE));
   }
 
   console.log("Jobs seeded successfully.");
@@ -44,31 +41,52 @@ async function saveJobToMongoDB(job: any): Promise<IJob> {
   return existingJob; // Return existing job if already present
 }
 
-async function saveJobToFastAPI(job: any) {
+async function saveJobsToFastAPI(jobs: any[]) {
   try {
-    const response = await axios.post(`${FASTAPI_URL}/upsert-job`, {
-      job_id: job._id.toString(),
-      combined_text: job.combined_text,
-      metadata: {
-        title: job.title,
-        industry: job.industry,
-        location: job.location,
-      },
+    const response = await axios.post(`${FASTAPI_URL}/upsert-jobs`, {
+      jobs: jobs.map((job) => ({
+        job_id: job._id.toString(),
+        combined_text: job.combined_text,
+        metadata: {
+          title: job.title,
+          industry: job.industry,
+          location: job.location,
+        },
+        // Section vectors let /recommend-jobs re-rank by max-sim
+        sections: {
+          jd: job.jobDescription,
+          context: job.requirementContext,
+          skills: job.skillsRequired,
+        },
+      })),
     });
 
-    console.log(`Job ${job.title} upserted:`, response.data);
+    const { upserted, failed, results } = response.data;
+    console.log(`Upserted ${upserted} jobs, ${failed} failed.`);
+    for (const result of results) {
+      if (result.status === "failed") {
+        console.error(`Failed to upsert job ${result.job_id}:`, result.error);
+      }
+    }
   } catch (error) {
     console.error(
-      `Failed to upsert job ${job.title}:`,
+      `Failed to upsert ${jobs.length} jobs:`,
       error.response?.data || error.message
     );
   }
 }
 
-async function saveJob(job: any) {
-  // 1. Save job to MongoDB
-  const savedJob = await saveJobToMongoDB(job);
+async function saveJobs(jobs: any[]) {
+  // 1. Save jobs to MongoDB
+  const savedJobs = [];
+  for (const job of jobs) {
+    if (typeof job.skillsRequired === "string") {
+      job.skillsRequired = JSON.parse(job.skillsRequired.replace(/'/g, '"'));
+    }
+    const savedJob = await saveJobToMongoDB(job);
+    savedJobs.push({ ...job, _id: savedJob._id });
+  }
 
-  // 2. Delegate embedding creation and upsert to FastAPI
-  await saveJobToFastAPI({ ...job, _id: savedJob._id });
+  // 2. Delegate embedding creation and upsert to FastAPI in one request
+  await saveJobsToFastAPI(savedJobs);
 }
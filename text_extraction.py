@@ -0,0 +1,151 @@
+# text_extraction.py
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional
+
+import mammoth
+import pdfplumber
+import pypdfium2 as pdfium
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+class UnreadableDocument(ValueError):
+    pass
+
+
+# Worker functions run in the process pool, so they stay at module level
+def count_pdf_pages(data: bytes) -> int:
+    try:
+        pdf = pdfium.PdfDocument(data)
+    except Exception:
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            return len(pdf.pages)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def extract_pdf_pages_pdfplumber(data: bytes, start: int, end: int) -> List[str]:
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def extract_pdf_pages(data: bytes, start: int, end: int) -> List[str]:
+    # pypdfium2 only pulls the text layer, which is much faster than pdfplumber
+    try:
+        pdf = pdfium.PdfDocument(data)
+    except Exception:
+        return extract_pdf_pages_pdfplumber(data, start, end)
+    texts = []
+    try:
+        for i in range(start, end):
+            try:
+                page = pdf[i]
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_range() or "")
+                textpage.close()
+                page.close()
+            except Exception:
+                texts.append(extract_pdf_pages_pdfplumber(data, i, i + 1)[0])
+    finally:
+        pdf.close()
+    return texts
+
+
+def extract_docx_text(data: bytes) -> str:
+    return mammoth.extract_raw_text(io.BytesIO(data)).value
+
+
+class TextExtractor:
+    """
+    Extracts CV text in a process pool so parsing never blocks the event loop.
+
+    PDFs are split into ranges of `pages_per_task` pages that are parsed in
+    parallel; `stream_pages` yields page texts in order as ranges complete.
+    Parser failures surface as `UnreadableDocument`. Each server worker owns a
+    pool, so size `max_workers` per worker rather than per machine.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pages: int = 50,
+        max_bytes: int = 10 * 1024 * 1024,
+        pages_per_task: int = 4,
+    ):
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def check_size(self, data: bytes):
+        if len(data) > self.max_bytes:
+            raise DocumentTooLarge(
+                f"File exceeds the {self.max_bytes // (1024 * 1024)} MB limit."
+            )
+
+    async def _run(self, filename: str, fn, *args):
+        # Parser errors on a corrupt upload are the client's problem, not a 500
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.pool, fn, *args
+            )
+        except (BrokenProcessPool, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            raise UnreadableDocument(f"Could not read {filename}: {e}") from e
+
+    async def stream_pages(self, data: bytes, filename: str) -> AsyncIterator[str]:
+        self.check_size(data)
+        if filename.endswith(".docx"):
+            yield await self._run(filename, extract_docx_text, data)
+            return
+        if not filename.endswith(".pdf"):
+            # Raise an error if the file type is not supported
+            raise ValueError("Unsupported file type")
+
+        page_count = await self._run(filename, count_pdf_pages, data)
+        page_count = min(page_count, self.max_pages)
+
+        tasks = [
+            asyncio.ensure_future(
+                self._run(
+                    filename,
+                    extract_pdf_pages,
+                    data,
+                    start,
+                    min(start + self.pages_per_task, page_count),
+                )
+            )
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        try:
+            for task in tasks:
+                for text in await task:
+                    yield text
+        finally:
+            for task in tasks:
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    task.exception()
+
+    async def extract_text(self, data: bytes, filename: str) -> str:
+        return "\n".join([text async for text in self.stream_pages(data, filename)])
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,576 @@
+# vector_store.py
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from file_lock import lock_file
+
+
+class VectorStore:
+    """
+    Minimal vector-store interface used by server.py.
+
+    Matches are plain dicts ({"id", "score", "metadata"}) and fetched vectors
+    are {"id": {"values", "metadata"}}, whatever the backend.
+    """
+
+    def upsert(self, vectors: List[dict], namespace: str = "") -> int:
+        raise NotImplementedError
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        namespace: str = "",
+        filter: Optional[dict] = None,
+        include_metadata: bool = True,
+    ) -> List[dict]:
+        return self.query_batch([vector], top_k, namespace, filter, include_metadata)[0]
+
+    def query_batch(
+        self,
+        vectors: List[List[float]],
+        top_k: int = 10,
+        namespace: str = "",
+        filter: Optional[dict] = None,
+        include_metadata: bool = True,
+    ) -> List[List[dict]]:
+        raise NotImplementedError
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, dict]:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str], namespace: str = "") -> int:
+        raise NotImplementedError
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self, index):
+        self.index = index
+
+    def upsert(self, vectors: List[dict], namespace: str = "") -> int:
+        self.index.upsert(vectors=vectors, namespace=namespace)
+        return len(vectors)
+
+    def query_batch(
+        self, vectors, top_k=10, namespace="", filter=None, include_metadata=True
+    ):
+        results = []
+        for vector in vectors:
+            response = self.index.query(
+                vector=list(vector),
+                top_k=top_k,
+                namespace=namespace,
+                filter=filter,
+                include_metadata=include_metadata,
+            )
+            results.append(
+                [
+                    {
+                        "id": match.id,
+                        "score": match.score,
+                        "metadata": match.metadata if include_metadata else None,
+                    }
+                    for match in response.matches
+                ]
+            )
+        return results
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, dict]:
+        response = self.index.fetch(ids=ids, namespace=namespace)
+        return {
+            vector_id: {"values": vector["values"], "metadata": vector.get("metadata")}
+            for vector_id, vector in response.get("vectors", {}).items()
+        }
+
+    def delete(self, ids: List[str], namespace: str = "") -> int:
+        self.index.delete(ids=ids, namespace=namespace)
+        return len(ids)
+
+
+def matches_filter(metadata: Optional[dict], filter: Optional[dict]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one record."""
+    if not filter:
+        return True
+    metadata = metadata or {}
+    for field, condition in filter.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq":
+                ok = value == operand or (isinstance(value, list) and operand in value)
+            elif op == "$ne":
+                ok = value != operand
+            elif op == "$in":
+                ok = value in operand
+            elif op == "$nin":
+                ok = value not in operand
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if not isinstance(value, (int, float)):
+                    return False
+                ok = {
+                    "$gt": value > operand,
+                    "$gte": value >= operand,
+                    "$lt": value < operand,
+                    "$lte": value <= operand,
+                }[op]
+            elif op == "$exists":
+                ok = (field in metadata) == operand
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if not ok:
+                return False
+    return True
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise indices of the k largest scores, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class _FieldIndex:
+    """
+    Column view of one metadata field for vectorised filtering.
+
+    Hashable values are dictionary-encoded into integer codes (a missing field
+    counts as None, like `metadata.get`) and numbers are also kept as floats
+    for range operators. Rows holding lists or other unhashable values are
+    few and keep the per-record semantics of `matches_filter`.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.codes = np.zeros(0, dtype=np.int32)
+        self.numbers = np.zeros(0, dtype=np.float64)
+        self.present = np.zeros(0, dtype=bool)
+        self.vocabulary: dict = {}
+        self.irregular: Dict[int, object] = {}
+
+    def _reserve(self, size: int):
+        if size <= len(self.codes):
+            return
+        capacity = max(size, 2 * len(self.codes), 1024)
+        codes = np.full(capacity, self._code(None), dtype=np.int32)
+        numbers = np.full(capacity, np.nan)
+        present = np.zeros(capacity, dtype=bool)
+        codes[: len(self.codes)] = self.codes
+        numbers[: len(self.numbers)] = self.numbers
+        present[: len(self.present)] = self.present
+        self.codes, self.numbers, self.present = codes, numbers, present
+
+    def _code(self, value) -> int:
+        code = self.vocabulary.get(value)
+        if code is None:
+            code = self.vocabulary[value] = len(self.vocabulary)
+        return code
+
+    def _lookup(self, value) -> int:
+        try:
+            return self.vocabulary.get(value, -2)
+        except TypeError:
+            return -2
+
+    def set(self, rows, records: List[Optional[dict]]):
+        rows = list(rows)
+        if rows:
+            self._reserve(max(rows) + 1)
+        for row, record in zip(rows, records):
+            record = record or {}
+            value = record.get(self.field)
+            self.present[row] = self.field in record
+            self.numbers[row] = value if isinstance(value, (int, float)) else np.nan
+            self.irregular.pop(row, None)
+            try:
+                self.codes[row] = self._code(value)
+            except TypeError:
+                self.codes[row] = -1
+                self.irregular[row] = value
+
+    def mask(self, op: str, operand, size: int) -> np.ndarray:
+        if op in ("$eq", "$ne"):
+            mask = self.codes[:size] == self._lookup(operand)
+        elif op in ("$in", "$nin"):
+            mask = np.isin(self.codes[:size], [self._lookup(item) for item in operand])
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            numbers = self.numbers[:size]
+            with np.errstate(invalid="ignore"):
+                mask = {
+                    "$gt": numbers > operand,
+                    "$gte": numbers >= operand,
+                    "$lt": numbers < operand,
+                    "$lte": numbers <= operand,
+                }[op]
+        elif op == "$exists":
+            mask = self.present[:size] == bool(operand)
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if op in ("$ne", "$nin"):
+            mask = ~mask
+        for row, value in self.irregular.items():
+            if row < size:
+                mask[row] = matches_filter(
+                    {self.field: value}, {self.field: {op: operand}}
+                )
+        return mask
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index: rows are bucketed by their nearest
+    k-means centroid and a query only scores the `n_probe` closest buckets,
+    read from a row-id list kept per centroid.
+    """
+
+    def __init__(self, n_lists: int = 256, n_probe: int = 8, seed: int = 42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+
+    def train(self, vectors: np.ndarray, n_iter: int = 10, sample_size: int = 50_000):
+        rng = np.random.default_rng(self.seed)
+        n_lists = min(self.n_lists, len(vectors))
+        sample = vectors[
+            rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)
+        ]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.maximum(norms, 1e-12)
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = self.assign(vectors)
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[c] : bounds[c + 1]] for c in range(n_lists)]
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def update(self, rows: np.ndarray, vectors: np.ndarray, size: int):
+        if len(self.assignments) < size:
+            grown = np.full(size, -1, dtype=np.int32)
+            grown[: len(self.assignments)] = self.assignments
+            self.assignments = grown
+        # Only the last write of a row counts when a batch repeats an id
+        _, last = np.unique(rows[::-1], return_index=True)
+        keep = len(rows) - 1 - last
+        rows, new = rows[keep], self.assign(vectors[keep])
+        old = self.assignments[rows]
+        moved = old != new
+        rows, old, new = rows[moved], old[moved], new[moved]
+        self.assignments[rows] = new
+        for c in np.unique(old[old >= 0]):
+            self.lists[c] = self.lists[c][~np.isin(self.lists[c], rows[old == c])]
+        for c in np.unique(new):
+            self.lists[c] = np.concatenate([self.lists[c], rows[new == c]])
+
+    def candidates(self, queries: np.ndarray) -> List[np.ndarray]:
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = top_k_indices(queries @ self.centroids.T, n_probe)
+        return [
+            np.sort(np.concatenate([self.lists[c] for c in lists])) for lists in probes
+        ]
+
+
+class _Namespace:
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[dict]] = []
+        self.rows: Dict[str, int] = {}
+        self.live = np.zeros(capacity, dtype=bool)
+        self.ann: Optional[IVFIndex] = None
+        self.fields: Dict[str, _FieldIndex] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def field(self, name: str) -> _FieldIndex:
+        # Built on the first filter over `name`, then kept current by upserts
+        index = self.fields.get(name)
+        if index is None:
+            index = self.fields[name] = _FieldIndex(name)
+            index.set(range(self.size), self.metadata)
+        return index
+
+    def filter_mask(self, filter: dict) -> np.ndarray:
+        """Vectorised `matches_filter` over every row of the namespace."""
+        mask = np.ones(self.size, dtype=bool)
+        for field, condition in filter.items():
+            if field == "$and":
+                for sub in condition:
+                    mask &= self.filter_mask(sub)
+                continue
+            if field == "$or":
+                either = np.zeros(self.size, dtype=bool)
+                for sub in condition:
+                    either |= self.filter_mask(sub)
+                mask &= either
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                mask &= self.field(field).mask(op, operand, self.size)
+        return mask
+
+    def reserve(self, size: int):
+        # Grows the matrix geometrically; also copies a read-only mmap into memory
+        capacity = len(self.vectors)
+        if size <= capacity and self.vectors.flags.writeable:
+            return
+        capacity = max(capacity, 1)
+        while capacity < size:
+            capacity *= 2
+        kept = min(len(self.vectors), size)
+        vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+        vectors[:kept] = self.vectors[:kept]
+        live = np.zeros(capacity, dtype=bool)
+        live[:kept] = self.live[:kept]
+        self.vectors, self.live = vectors, live
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store holding each namespace as a contiguous float32
+    matrix. Queries are exact batched dot products; namespaces larger than
+    `ann_min_size` (None disables) switch to an IVF approximate index.
+
+    With `path` set, `save()` writes `vectors.npy` plus ids/metadata per
+    namespace and a later instance memory-maps the matrix on load.
+
+    The store lives in one process, so it is single-worker only: other workers
+    would neither see its writes nor keep theirs past `save()`. With `path`
+    set, a second process opening the same directory fails instead.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        metric: str = "cosine",
+        ann_min_size: Optional[int] = 50_000,
+        ann_lists: int = 256,
+        ann_probe: int = 8,
+    ):
+        if metric not in ("cosine", "dotproduct"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.path = path
+        self.metric = metric
+        self.ann_min_size = ann_min_size
+        self.ann_lists = ann_lists
+        self.ann_probe = ann_probe
+        self.namespaces: Dict[str, _Namespace] = {}
+        self.lock = threading.RLock()
+        self._owner = None
+        if path:
+            self._claim()
+            self.load()
+
+    def _claim(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._owner = open(os.path.join(self.path, "lock"), "a+b")
+        if not lock_file(self._owner, blocking=False):
+            self._owner.close()
+            raise RuntimeError(
+                f"Local vector store {self.path} is already open in another "
+                "process; VECTOR_STORE=local supports a single worker only."
+            )
+
+    def _prepare(self, vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def upsert(self, vectors: List[dict], namespace: str = "") -> int:
+        if not vectors:
+            return 0
+        values = self._prepare([vector["values"] for vector in vectors])
+        with self.lock:
+            ns = self.namespaces.get(namespace)
+            if ns is None:
+                ns = self.namespaces[namespace] = _Namespace(values.shape[1])
+            if values.shape[1] != ns.vectors.shape[1]:
+                raise ValueError(
+                    f"Vector dimension {values.shape[1]} does not match "
+                    f"namespace dimension {ns.vectors.shape[1]}"
+                )
+            rows = []
+            for vector in vectors:
+                row = ns.rows.get(vector["id"])
+                if row is None:
+                    row = ns.size
+                    ns.rows[vector["id"]] = row
+                    ns.ids.append(vector["id"])
+                    ns.metadata.append(None)
+                rows.append(row)
+            ns.reserve(ns.size)
+            rows = np.array(rows)
+            ns.vectors[rows] = values
+            ns.live[rows] = True
+            for row, vector in zip(rows, vectors):
+                ns.metadata[row] = vector.get("metadata") or {}
+            for index in ns.fields.values():
+                index.set(rows, [ns.metadata[row] for row in rows])
+            if ns.ann is not None:
+                ns.ann.update(rows, values, ns.size)
+            elif self.ann_min_size and ns.size >= self.ann_min_size:
+                self.build_ann(namespace)
+            return len(vectors)
+
+    def build_ann(self, namespace: str = ""):
+        with self.lock:
+            ns = self.namespaces[namespace]
+            ns.ann = IVFIndex(self.ann_lists, self.ann_probe)
+            ns.ann.train(ns.vectors[: ns.size])
+
+    def _mask(self, ns: _Namespace, filter: Optional[dict]) -> np.ndarray:
+        mask = ns.live[: ns.size].copy()
+        if filter:
+            mask &= ns.filter_mask(filter)
+        return mask
+
+    def _matches(self, ns, rows, scores, include_metadata) -> List[dict]:
+        return [
+            {
+                "id": ns.ids[row],
+                "score": float(score),
+                "metadata": ns.metadata[row] if include_metadata else None,
+            }
+            for row, score in zip(rows, scores)
+        ]
+
+    def query_batch(
+        self, vectors, top_k=10, namespace="", filter=None, include_metadata=True
+    ):
+        queries = self._prepare(vectors)
+        with self.lock:
+            ns = self.namespaces.get(namespace)
+            if ns is None or ns.size == 0:
+                return [[] for _ in queries]
+            mask = self._mask(ns, filter)
+            matrix = ns.vectors[: ns.size]
+
+            if ns.ann is None:
+                scores = queries @ matrix.T
+                scores[:, ~mask] = -np.inf
+                best = top_k_indices(scores, top_k)
+                return [
+                    self._matches(
+                        ns,
+                        [r for r in rows if mask[r]],
+                        [s for r, s in zip(rows, scores[i, rows]) if mask[r]],
+                        include_metadata,
+                    )
+                    for i, rows in enumerate(best)
+                ]
+
+            results = []
+            for query, candidates in zip(queries, ns.ann.candidates(queries)):
+                candidates = candidates[mask[candidates]]
+                scores = matrix[candidates] @ query
+                best = top_k_indices(scores[None, :], top_k)[0]
+                results.append(
+                    self._matches(ns, candidates[best], scores[best], include_metadata)
+                )
+            return results
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, dict]:
+        with self.lock:
+            ns = self.namespaces.get(namespace)
+            if ns is None:
+                return {}
+            fetched = {}
+            for vector_id in ids:
+                row = ns.rows.get(vector_id)
+                if row is not None and ns.live[row]:
+                    fetched[vector_id] = {
+                        "values": ns.vectors[row].tolist(),
+                        "metadata": ns.metadata[row],
+                    }
+            return fetched
+
+    def delete(self, ids: List[str], namespace: str = "") -> int:
+        with self.lock:
+            ns = self.namespaces.get(namespace)
+            if ns is None:
+                return 0
+            deleted = 0
+            for vector_id in ids:
+                row = ns.rows.get(vector_id)
+                if row is not None and ns.live[row]:
+                    ns.live[row] = False
+                    ns.metadata[row] = None
+                    deleted += 1
+            return deleted
+
+    def _namespace_dir(self, namespace: str) -> str:
+        return os.path.join(self.path, namespace or "__default__")
+
+    def save(self):
+        """Write live vectors of every namespace to `path`, compacting deletes."""
+        with self.lock:
+            for namespace, ns in self.namespaces.items():
+                directory = self._namespace_dir(namespace)
+                os.makedirs(directory, exist_ok=True)
+                rows = np.flatnonzero(ns.live[: ns.size])
+                tmp = os.path.join(directory, "vectors.tmp.npy")
+                np.save(tmp, ns.vectors[rows])
+                os.replace(tmp, os.path.join(directory, "vectors.npy"))
+                records = {
+                    "namespace": namespace,
+                    "ids": [ns.ids[row] for row in rows],
+                    "metadata": [ns.metadata[row] for row in rows],
+                }
+                tmp = os.path.join(directory, "records.tmp.json")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(records, f, ensure_ascii=False)
+                os.replace(tmp, os.path.join(directory, "records.json"))
+
+    def load(self):
+        if not os.path.isdir(self.path):
+            return
+        with self.lock:
+            for entry in os.listdir(self.path):
+                directory = os.path.join(self.path, entry)
+                records_path = os.path.join(directory, "records.json")
+                if not os.path.exists(records_path):
+                    continue
+                with open(records_path, encoding="utf-8") as f:
+                    records = json.load(f)
+                # Read-only mmap; the first write copies it into memory
+                vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+                ns = _Namespace(vectors.shape[1], capacity=1)
+                ns.vectors = vectors
+                ns.ids = list(records["ids"])
+                ns.metadata = list(records["metadata"])
+                ns.rows = {vector_id: row for row, vector_id in enumerate(ns.ids)}
+                ns.live = np.ones(len(ns.ids), dtype=bool)
+                self.namespaces[records["namespace"]] = ns
+                if self.ann_min_size and ns.size >= self.ann_min_size:
+                    self.build_ann(records["namespace"])